@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import json
 import os
+import tempfile
 import dj_database_url
 
 from pathlib import Path
@@ -52,6 +54,7 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'equipment.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -63,6 +66,7 @@ MIDDLEWARE = [
 CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS', '').split(',') if os.environ.get('CORS_ALLOWED_ORIGINS') else [
     'http://localhost:3000',
 ]
+CORS_EXPOSE_HEADERS = ['X-Total-Count', 'Link']
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -176,4 +180,118 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Equipment CSV ingestion
+# Uploads above the threshold (or sent with ?mode=stream) are summarized in
+# chunks of EQUIPMENT_CSV_CHUNK_SIZE rows instead of being loaded whole.
+
+EQUIPMENT_CSV_CHUNK_SIZE = int(os.environ.get('EQUIPMENT_CSV_CHUNK_SIZE', 50000))
+EQUIPMENT_STREAMING_UPLOAD_THRESHOLD = int(os.environ.get('EQUIPMENT_STREAMING_UPLOAD_THRESHOLD', 10 * 1024 * 1024))
+
+# Uploads sent with ?mode=async are queued as IngestJob rows. Each web process
+# runs this many background threads to drain the queue; set it to 0 to leave
+# the work to `python manage.py run_ingest_jobs`.
+EQUIPMENT_INGEST_WORKERS = int(os.environ.get('EQUIPMENT_INGEST_WORKERS', 1))
+
+# A running job whose worker has not reported progress for this many seconds
+# is assumed dead and requeued, up to EQUIPMENT_JOB_MAX_ATTEMPTS claims in all.
+EQUIPMENT_JOB_CLAIM_TIMEOUT = int(os.environ.get('EQUIPMENT_JOB_CLAIM_TIMEOUT', 30 * 60))
+EQUIPMENT_JOB_MAX_ATTEMPTS = int(os.environ.get('EQUIPMENT_JOB_MAX_ATTEMPTS', 3))
+
+# Resumable uploads (/api/equipment/uploads/) are assembled under
+# MEDIA_ROOT/uploads/partial and capped at this many bytes.
+EQUIPMENT_MAX_UPLOAD_SIZE = int(os.environ.get('EQUIPMENT_MAX_UPLOAD_SIZE', 2 * 1024 ** 3))
+
+# Uploads are hashed (SHA-256) while Django reads them off the wire so that
+# repeat uploads of the same content can reuse the stored dataset.
+FILE_UPLOAD_HANDLERS = [
+    'equipment.upload_handlers.HashingMemoryFileUploadHandler',
+    'equipment.upload_handlers.HashingTemporaryFileUploadHandler',
+]
+
+# Declared dtypes for equipment columns, merged over the defaults in
+# equipment/schema.py, e.g. '{"Pressure": "float", "Site": "category"}'.
+# EQUIPMENT_FLOAT32 narrows float columns to float32 once summarized.
+EQUIPMENT_COLUMN_SCHEMA = json.loads(os.environ.get('EQUIPMENT_COLUMN_SCHEMA', '{}'))
+EQUIPMENT_FLOAT32 = os.environ.get('EQUIPMENT_FLOAT32', 'false').lower() in ('1', 'true', 'yes')
+
+# gzip, zstd and single-file zip uploads are parsed as they are inflated.
+# By default the upload is stored as sent; set this to false to store the
+# plain CSV instead.
+EQUIPMENT_STORE_COMPRESSED = os.environ.get('EQUIPMENT_STORE_COMPRESSED', 'true').lower() in ('1', 'true', 'yes')
+
+# Batch uploads (/api/equipment/upload/batch/) are parsed in a process pool
+# of this many workers, one pool per web process, so the host runs up to
+# WEB_CONCURRENCY times as many parsers.
+EQUIPMENT_BATCH_WORKERS = int(os.environ.get('EQUIPMENT_BATCH_WORKERS', 2))
+EQUIPMENT_BATCH_MAX_FILES = int(os.environ.get('EQUIPMENT_BATCH_MAX_FILES', 50))
+
+# Dataset summaries carry per-column histograms with this many bins. Quantiles
+# and histograms are exact up to EQUIPMENT_SUMMARY_SAMPLE_SIZE rows and come
+# from a uniform sample of that size beyond it.
+EQUIPMENT_SUMMARY_HISTOGRAM_BINS = int(os.environ.get('EQUIPMENT_SUMMARY_HISTOGRAM_BINS', 20))
+EQUIPMENT_SUMMARY_SAMPLE_SIZE = int(os.environ.get('EQUIPMENT_SUMMARY_SAMPLE_SIZE', 1000000))
+
+# Fixed pie-chart bins per column, merged over the Temperature thresholds in
+# equipment/binning.py, e.g. '{"Pressure": {"edges": [10, 50], "labels": ["Low", "Normal", "High"]}}'.
+EQUIPMENT_PIE_BIN_EDGES = json.loads(os.environ.get('EQUIPMENT_PIE_BIN_EDGES', '{}'))
+
+# Rows returned per page by GET /api/equipment/datasets/<id>/ unless ?limit=
+# asks for fewer (or more, up to the maximum).
+EQUIPMENT_DETAIL_PAGE_SIZE = int(os.environ.get('EQUIPMENT_DETAIL_PAGE_SIZE', 1000))
+EQUIPMENT_DETAIL_MAX_PAGE_SIZE = int(os.environ.get('EQUIPMENT_DETAIL_MAX_PAGE_SIZE', 10000))
+
+# Datasets per page of GET /api/equipment/history/; the next page is linked
+# from the response's Link header.
+EQUIPMENT_HISTORY_PAGE_SIZE = int(os.environ.get('EQUIPMENT_HISTORY_PAGE_SIZE', 100))
+EQUIPMENT_HISTORY_MAX_PAGE_SIZE = int(os.environ.get('EQUIPMENT_HISTORY_MAX_PAGE_SIZE', 1000))
+
+# Point budget for GET /api/equipment/datasets/<id>/chart/ (?points=), and
+# the most bars the PDF report's bar chart draws.
+EQUIPMENT_CHART_DEFAULT_POINTS = int(os.environ.get('EQUIPMENT_CHART_DEFAULT_POINTS', 200))
+EQUIPMENT_CHART_MAX_POINTS = int(os.environ.get('EQUIPMENT_CHART_MAX_POINTS', 5000))
+EQUIPMENT_REPORT_BAR_POINTS = int(os.environ.get('EQUIPMENT_REPORT_BAR_POINTS', 50))
+
+# Datasets without an Arrow copy are parsed from their CSV. With the shared
+# cache below disabled, the parsed frames are kept in a per-process LRU
+# cache up to this many bytes (counted with DataFrame.memory_usage(deep=True));
+# 0 disables it.
+EQUIPMENT_FRAME_CACHE_BYTES = int(os.environ.get('EQUIPMENT_FRAME_CACHE_BYTES', 256 * 1024 ** 2))
+
+# Workers on the same host share those parsed frames through memory-mapped
+# Arrow files in this directory, evicted oldest-used first past the byte
+# limit; 0 disables the shared cache. Datasets with an Arrow copy map that
+# copy instead. Keep the directory on local disk.
+EQUIPMENT_SHARED_CACHE_DIR = os.environ.get('EQUIPMENT_SHARED_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'equipment-frame-cache'))
+EQUIPMENT_SHARED_CACHE_BYTES = int(os.environ.get('EQUIPMENT_SHARED_CACHE_BYTES', 1024 ** 3))
+
+# GET /api/equipment/datasets/<id>/?stream=json|ndjson|arrow writes every row
+# (or ?limit= of them) in chunks of this many rows.
+EQUIPMENT_STREAM_CHUNK_ROWS = int(os.environ.get('EQUIPMENT_STREAM_CHUNK_ROWS', 10000))
+
+# API responses of at least this many bytes are sent brotli- (when the Brotli
+# package is installed) or gzip-compressed if the client accepts it. Static
+# files are left to WhiteNoise, and PDFs and archives are sent as they are.
+EQUIPMENT_COMPRESSION_MIN_SIZE = int(os.environ.get('EQUIPMENT_COMPRESSION_MIN_SIZE', 1024))
+EQUIPMENT_GZIP_LEVEL = int(os.environ.get('EQUIPMENT_GZIP_LEVEL', 6))
+EQUIPMENT_BROTLI_QUALITY = int(os.environ.get('EQUIPMENT_BROTLI_QUALITY', 5))
+
+# Files under MEDIA_ROOT that no row references any more (deleted or evicted
+# datasets, failed uploads) are swept every EQUIPMENT_MEDIA_GC_INTERVAL seconds
+# by each web process (0 leaves it to `python manage.py gc_media`). Files
+# younger than the grace period are never touched.
+EQUIPMENT_MEDIA_GC_INTERVAL = int(os.environ.get('EQUIPMENT_MEDIA_GC_INTERVAL', 6 * 60 * 60))
+EQUIPMENT_MEDIA_GC_GRACE = int(os.environ.get('EQUIPMENT_MEDIA_GC_GRACE', 60 * 60))
+EQUIPMENT_MEDIA_GC_BATCH_SIZE = int(os.environ.get('EQUIPMENT_MEDIA_GC_BATCH_SIZE', 500))
+
+# Rendered PDF reports are kept per dataset for this many chart-parameter
+# combinations, least recently downloaded evicted first.
+EQUIPMENT_REPORT_CACHE_VARIANTS = int(os.environ.get('EQUIPMENT_REPORT_CACHE_VARIANTS', 4))
+
+# GET /download-report/<id>/ renders inline only for datasets of up to this
+# many rows; larger ones are POSTed there and rendered as ReportJob rows by
+# EQUIPMENT_REPORT_WORKERS threads per web process (0 leaves them to
+# `python manage.py run_report_jobs`).
+EQUIPMENT_REPORT_SYNC_MAX_ROWS = int(os.environ.get('EQUIPMENT_REPORT_SYNC_MAX_ROWS', 50000))
+EQUIPMENT_REPORT_WORKERS = int(os.environ.get('EQUIPMENT_REPORT_WORKERS', 1))
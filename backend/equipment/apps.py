@@ -1,6 +1,16 @@
+import pandas as pd
 from django.apps import AppConfig
 
 
 class EquipmentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'equipment'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # The frame caches hand out shallow copies of the frames they keep
+        # (see cache.FrameCache); copy-on-write stops a caller's writes from
+        # reaching the cached frame. From pandas 3 it is always on.
+        if int(pd.__version__.split('.')[0]) < 3:
+            pd.set_option('mode.copy_on_write', True)
@@ -0,0 +1,187 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .columnar import adopt_columnar_file, pa, write_columnar_file
+from .ingest import (
+    EVICT_OLDEST, clone_dataset, create_dataset, find_by_content, read_csv_chunks, reserve_room, scan_csv,
+)
+from .schema import SchemaError
+from .upload_handlers import file_sha256
+
+
+def parse_upload(source, work_dir):
+    """Summarize one CSV and write its columnar copy; runs in a worker process.
+
+    ``source`` is a file path or, for uploads Django kept in memory, the raw
+    bytes. Returns a dict with either ``summary`` (and ``columnar_path``) or
+    ``error``.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    try:
+        accumulator = scan_csv(source)
+    except SchemaError as e:
+        return {'error': str(e)}
+
+    result = {'summary': accumulator.summary(), 'columnar_path': None}
+    if pa is not None:
+        if isinstance(source, io.BytesIO):
+            source.seek(0)
+        fd, columnar_path = tempfile.mkstemp(prefix='.batch-', suffix='.arrow', dir=work_dir)
+        os.close(fd)
+        dtypes = accumulator.column_dtypes()
+        try:
+            write_columnar_file(columnar_path, dtypes, read_csv_chunks(source, dtype=dtypes))
+        except Exception as e:
+            # Nothing will adopt a half-written file; don't leave it for the GC
+            os.remove(columnar_path)
+            return {'error': f"Could not convert the CSV: {e}"}
+        result['columnar_path'] = columnar_path
+    return result
+
+
+def _source(file):
+    if hasattr(file, 'temporary_file_path'):
+        return file.temporary_file_path()
+    file.seek(0)
+    return file.read()
+
+
+def ingest_batch(user, files, on_limit=EVICT_OLDEST):
+    """Ingest several uploads at once, parsing them in parallel.
+
+    Returns one result dict per file, in the order given. Room under the
+    upload limit is made once for the whole batch, in the transaction that
+    creates its Datasets (see reserve_room): only datasets from before the
+    batch are evicted, never ones it creates itself. Files beyond the room
+    there is, in upload order, come back as 409s.
+    """
+    results = [None] * len(files)
+    hashes = [file_sha256(file) for file in files]
+    # index -> the stored Dataset it duplicates, or the index of its first copy in this batch
+    sources = {}
+    pending = {}
+    first_seen = {}
+    for index, (file, content_hash) in enumerate(zip(files, hashes)):
+        existing = find_by_content(content_hash)
+        if existing is not None:
+            sources[index] = existing
+        elif content_hash in first_seen:
+            # Same content twice in one batch: parse it once, clone it afterwards
+            sources[index] = first_seen[content_hash]
+        else:
+            first_seen[content_hash] = index
+            pending[index] = file
+
+    parsed = _parse_all(pending) if pending else {}
+    for index, file in pending.items():
+        outcome = parsed[index]
+        if 'error' in outcome:
+            results[index] = {'filename': file.name, 'status': outcome.get('status', 400), 'error': outcome['error']}
+    for index, source in sources.items():
+        if isinstance(source, int) and results[source] is not None:
+            results[index] = dict(results[source], filename=files[index].name)
+
+    creating = [index for index, result in enumerate(results) if result is None]
+    datasets = {}
+    try:
+        with transaction.atomic():
+            fitting, refusal = reserve_room(user, len(creating), on_limit)
+            for position, index in enumerate(creating):
+                file = files[index]
+                if position >= fitting:
+                    # A copy always comes after its original, so it never fits when that did not
+                    results[index] = _limit_reached(file.name, refusal)
+                    continue
+                source = sources.get(index)
+                if source is None:
+                    outcome = parsed[index]
+                    dataset = create_dataset(user, file.name, file, outcome['summary'], hashes[index], room_made=True)
+                    if outcome['columnar_path']:
+                        adopt_columnar_file(dataset, outcome['columnar_path'])
+                else:
+                    original = datasets[source] if isinstance(source, int) else source
+                    dataset = clone_dataset(original, user, file.name, room_made=True)
+                datasets[index] = dataset
+                results[index] = _success(file.name, dataset)
+    finally:
+        for index, outcome in parsed.items():
+            path = outcome.get('columnar_path')
+            if path and os.path.exists(path):
+                os.remove(path)
+    return results
+
+
+def _limit_reached(filename, error):
+    return {
+        'filename': filename, 'status': 409, 'error': str(error), 'limit': error.limit, 'would_evict': error.oldest,
+    }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _batch_pool():
+    """The process pool batches are parsed in, one per web process, started on first use.
+
+    Its workers come from a forkserver rather than a fork of this process,
+    which runs the ingest, report and GC threads: a fork could inherit a lock
+    one of them holds and deadlock.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.EQUIPMENT_BATCH_WORKERS, mp_context=multiprocessing.get_context('forkserver'),
+                initializer=django.setup,
+            )
+        return _pool
+
+
+def _discard_pool(pool):
+    # A worker died (killed, out of memory); the next batch starts a fresh pool
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _parse_all(pending):
+    # Temporary columnar files go next to their final location so that
+    # adopting them is a rename, not a copy.
+    work_dir = default_storage.path('datasets')
+    os.makedirs(work_dir, exist_ok=True)
+    pool = _batch_pool()
+    futures = {index: pool.submit(parse_upload, _source(file), work_dir) for index, file in pending.items()}
+    parsed = {}
+    for index, future in futures.items():
+        try:
+            parsed[index] = future.result()
+        except BrokenProcessPool as e:
+            _discard_pool(pool)
+            parsed[index] = {'status': 500, 'error': str(e)}
+        except Exception as e:
+            parsed[index] = {'status': 500, 'error': str(e)}
+    return parsed
+
+
+def _success(filename, dataset):
+    return {
+        'filename': filename,
+        'status': 201,
+        'dataset_id': dataset.id,
+        'uploaded_at': dataset.uploaded_at,
+        'summary': dataset.summary,
+    }
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Columns with fixed, domain-specific thresholds. A value falls in labels[i]
+# when edges[i - 1] <= value < edges[i]; the first and last labels are open-ended.
+DEFAULT_BIN_EDGES = {
+    'Temperature': {
+        'edges': [290, 310, 330, 350],
+        'labels': [
+            "Cool (<290°C)",
+            "Warm (290-310°C)",
+            "Moderately High (310-330°C)",
+            "High (330-350°C)",
+            "Extremely High (>350°C)",
+        ],
+    },
+}
+
+RANGE_BIN_NAMES = ['Low', 'Medium-Low', 'Medium-High', 'High']
+
+
+def bin_edges():
+    # EQUIPMENT_PIE_BIN_EDGES overrides or adds entries to the table above
+    table = dict(DEFAULT_BIN_EDGES)
+    table.update(settings.EQUIPMENT_PIE_BIN_EDGES)
+    for col, spec in table.items():
+        if len(spec['labels']) != len(spec['edges']) + 1:
+            raise ImproperlyConfigured(f"Bins for '{col}' need exactly one more label than edges.")
+    return table
+
+
+def range_bins(min_val, max_val):
+    # Four equal-width bins spanning the column's range
+    bin_width = (max_val - min_val) / 4
+    bounds = [min_val + i * bin_width for i in range(4)] + [max_val]
+    labels = [
+        f"{name} ({bounds[i]:.2f} - {bounds[i + 1]:.2f})" for i, name in enumerate(RANGE_BIN_NAMES)
+    ]
+    return bounds[1:4], labels
+
+
+def distribution(values, col, min_val=None, max_val=None):
+    """Count the values of one column per pie slice, largest slice first.
+
+    Numeric columns are binned with a single np.digitize pass, either by the
+    fixed edges configured for the column or into four equal-width ranges
+    between ``min_val`` and ``max_val`` (taken from the data when omitted).
+    Anything else is counted by value.
+    """
+    if values.dtype.kind not in 'iuf':
+        return values.value_counts()
+
+    table = bin_edges()
+    if col in table:
+        edges, labels = table[col]['edges'], table[col]['labels']
+    else:
+        if min_val is None or max_val is None:
+            min_val, max_val = values.min(), values.max()
+        edges, labels = range_bins(min_val, max_val)
+
+    # NaN compares false against every edge and lands in the last bin
+    indices = np.digitize(values.to_numpy(dtype='float64'), edges)
+    return pd.Series(np.asarray(labels, dtype=object)[indices]).value_counts()
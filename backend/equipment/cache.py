@@ -0,0 +1,236 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+class FrameCache:
+    """Process-local LRU cache of parsed dataset frames, bounded by their memory use.
+
+    Entries are keyed by dataset id and the mtime of the file they were read
+    from, so a rewritten sidecar is never served stale. Callers get shallow
+    copies, which share the cached frame's data; EquipmentConfig.ready turns
+    on pandas copy-on-write, so writing to a copy never changes the original.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def budget(self):
+        return settings.EQUIPMENT_FRAME_CACHE_BYTES
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0].copy(deep=False)
+
+    def put(self, key, df):
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.budget:
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (df, nbytes)
+            self.size += nbytes
+            while self.size > self.budget:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+
+    def invalidate(self, dataset_ids):
+        dataset_ids = set(dataset_ids)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] in dataset_ids]:
+                self._discard(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'budget': self.budget,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+
+frame_cache = FrameCache()
+
+
+class MappedCache:
+    """Parsed CSV-only datasets shared by every worker on the host as memory-mapped Arrow files.
+
+    Datasets with an Arrow copy of their own are mapped from it directly and
+    never land here. The first worker to parse a dataset writes it, uncompressed, to
+    EQUIPMENT_SHARED_CACHE_DIR under a temporary name and renames it into
+    place, so other workers either miss or map a complete file. Mapped
+    pages live in the OS page cache once however many workers read them.
+    Files are evicted oldest-used first when the directory grows past
+    EQUIPMENT_SHARED_CACHE_BYTES; a worker still mapping an evicted file
+    keeps reading it until it lets go. Counters are per process.
+    """
+    SUFFIX = '.arrow'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def directory(self):
+        return settings.EQUIPMENT_SHARED_CACHE_DIR
+
+    @property
+    def budget(self):
+        return settings.EQUIPMENT_SHARED_CACHE_BYTES
+
+    @property
+    def enabled(self):
+        return pa is not None and self.budget > 0
+
+    def _path(self, key):
+        dataset_id, source, mtime_ns = key
+        digest = hashlib.sha1(source.encode()).hexdigest()[:12]
+        return os.path.join(self.directory, f"{dataset_id}-{digest}-{mtime_ns}{self.SUFFIX}")
+
+    def get(self, key):
+        """The cached table for ``key``, mapped read-only, or None."""
+        path = self._path(key)
+        try:
+            table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        except (FileNotFoundError, pa.ArrowInvalid):
+            with self._lock:
+                self.misses += 1
+            return None
+        # The mtime doubles as the last-used time that eviction goes by
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return table
+
+    def put(self, key, df):
+        """Publish ``df`` under ``key`` and return it mapped back, or None if it does not fit."""
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if table.nbytes > self.budget:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        # Older versions of the same dataset can no longer be asked for
+        self._remove(self._files(key[0]), keep=path)
+        self._evict(keep=path)
+        return pa.ipc.open_file(pa.memory_map(path)).read_all()
+
+    def invalidate(self, dataset_ids):
+        if not self.enabled:
+            return
+        for dataset_id in set(dataset_ids):
+            removed = self._remove(self._files(dataset_id))
+            with self._lock:
+                self.invalidations += removed
+
+    def stats(self):
+        files = self._files()
+        with self._lock:
+            return {
+                'entries': len(files),
+                'bytes': sum(size for _, size, _ in files),
+                'budget': self.budget,
+                'directory': str(self.directory),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def _files(self, dataset_id=None):
+        """(path, size, mtime) of the published files, optionally just one dataset's."""
+        prefix = f"{dataset_id}-" if dataset_id is not None else ''
+        files = []
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return files
+        for entry in entries:
+            if not (entry.name.endswith(self.SUFFIX) and entry.name.startswith(prefix)):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _remove(self, files, keep=None):
+        removed = 0
+        for path, _, _ in files:
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def _evict(self, keep):
+        files = sorted(self._files(), key=lambda file: file[2])
+        total = sum(size for _, size, _ in files)
+        victims = []
+        for file in files:
+            if total <= self.budget:
+                break
+            if file[0] != keep:
+                victims.append(file)
+                total -= file[1]
+        removed = self._remove(victims)
+        with self._lock:
+            self.evictions += removed
+
+
+shared_cache = MappedCache()
@@ -0,0 +1,196 @@
+import numpy as np
+from django.conf import settings
+
+from .binning import distribution
+from .columnar import load_dataframe, load_rows, load_sorted_index
+
+CHART_KINDS = ('top', 'group', 'histogram', 'lttb', 'pie')
+GROUP_AGGREGATES = ('mean', 'min', 'max', 'count')
+
+
+class ChartError(ValueError):
+    pass
+
+
+def _json_values(values):
+    # NaN is not valid JSON; missing values become null
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+def point_budget(params):
+    raw = params.get('points')
+    if raw in (None, ''):
+        return settings.EQUIPMENT_CHART_DEFAULT_POINTS
+    try:
+        points = int(raw)
+    except ValueError:
+        raise ChartError("'points' must be an integer.")
+    if points < 1:
+        raise ChartError("'points' must be at least 1.")
+    return min(points, settings.EQUIPMENT_CHART_MAX_POINTS)
+
+
+def chart_series(dataset, summary, params):
+    """Build a chart-ready payload of at most ``points`` entries per series.
+
+    kind=top        the ``points`` rows with the largest ``by`` (default: first y column)
+    kind=group      per-Type ``agg`` (mean/min/max/count) of each y column, from the summary
+    kind=histogram  ``points`` equal-width buckets of the single y column
+    kind=lttb       y columns downsampled with Largest-Triangle-Three-Buckets along x
+                    (a numeric column, or row order when omitted)
+    kind=pie        slice counts of any ``column``, binned as in the PDF report (see binning.py)
+    """
+    columns = list(summary.get('null_counts', {}))
+    numeric = summary.get('stats', {})
+    kind = params.get('kind', 'top')
+    if kind not in CHART_KINDS:
+        raise ChartError(f"'kind' must be one of: {', '.join(CHART_KINDS)}.")
+    points = point_budget(params)
+
+    if kind == 'pie':
+        column = params.get('column', 'Temperature')
+        if column not in columns:
+            raise ChartError(f"Unknown column '{column}'.")
+        return _pie(dataset, numeric.get(column) or {}, column, points)
+
+    ys = [col.strip() for col in params.get('y', 'Flowrate,Pressure,Temperature').split(',') if col.strip()]
+    for col in ys:
+        if col not in numeric:
+            raise ChartError(f"'{col}' is not a numeric column.")
+    if not ys:
+        raise ChartError("At least one y column is required.")
+
+    if kind == 'group':
+        return _group(summary, ys, params.get('agg', 'mean'), points)
+    if kind == 'histogram':
+        return _histogram(dataset, numeric[ys[0]], ys[0], points)
+
+    x = params.get('x', 'Equipment Name' if kind == 'top' else '')
+    if x and x not in columns:
+        raise ChartError(f"Unknown column '{x}'.")
+    if kind == 'top':
+        if not x:
+            raise ChartError("kind=top needs an x column for its labels.")
+        by = params.get('by', ys[0])
+        if by not in numeric:
+            raise ChartError(f"'{by}' is not a numeric column.")
+        return _top(dataset, x, ys, by, points)
+    if x and x not in numeric:
+        raise ChartError("kind=lttb needs a numeric x column (or none, for row order).")
+    return _lttb(dataset, x, ys, points)
+
+
+def _top(dataset, x, ys, by, points):
+    index = load_sorted_index(dataset)
+    if by in index:
+        positions = _largest(*index[by], points)
+    else:
+        positions = load_dataframe(dataset, columns=[by])[by].nlargest(points).index.to_numpy()
+
+    rows = load_rows(dataset, positions, columns=list(dict.fromkeys([x] + ys)))
+    return {
+        'kind': 'top',
+        'labels': _json_values(rows[x].astype(str)),
+        'series': {col: _json_values(rows[col]) for col in ys},
+    }
+
+
+def _largest(order, sorted_values, points):
+    """Rows of the ``points`` largest values, as ``Series.nlargest`` picks and orders them.
+
+    The index is a stable ascending sort, so tied values sit in row order;
+    like nlargest (keep='first') the earliest of them win and come first.
+    """
+    # Largest values sit just before the NaNs at the end of the sorted index
+    valid = np.searchsorted(sorted_values, np.nan) if sorted_values.dtype.kind == 'f' else len(sorted_values)
+    # Short of values, nlargest fills up with the NaN rows, in row order
+    missing = order[valid:valid + max(points - valid, 0)]
+    points = min(points, valid)
+    if points <= 0:
+        return missing
+    start = valid - points
+    # Values tied with the smallest one kept are taken from the front of their run
+    low = np.searchsorted(sorted_values[:valid], sorted_values[start], side='left')
+    high = np.searchsorted(sorted_values[:valid], sorted_values[start], side='right')
+    picked = np.concatenate([np.arange(low, low + points - (valid - high)), np.arange(high, valid)])
+    # Descending by value, ascending by row within a value
+    picked = picked[np.lexsort((order[picked], -sorted_values[picked]))]
+    return np.concatenate([order[picked], missing])
+
+
+def _group(summary, ys, agg, points):
+    if agg not in GROUP_AGGREGATES:
+        raise ChartError(f"'agg' must be one of: {', '.join(GROUP_AGGREGATES)}.")
+    # Groups come in type_distribution order (largest first); the smallest fall outside the budget
+    groups = list(summary.get('by_type', {}).items())[:points]
+    series = {}
+    for col in ys:
+        if agg == 'count':
+            series[col] = [group['count'] for _, group in groups]
+        else:
+            series[col] = [group['columns'].get(col, {}).get(agg) for _, group in groups]
+    return {'kind': 'group', 'agg': agg, 'labels': [str(name) for name, _ in groups], 'series': series}
+
+
+def _histogram(dataset, stats, col, bins):
+    histogram = stats.get('histogram', {})
+    if len(histogram.get('counts', [])) == bins and not stats.get('sampled'):
+        edges, counts = histogram['edges'], histogram['counts']
+    elif not stats.get('count'):
+        edges, counts = [], []
+    else:
+        values = load_dataframe(dataset, columns=[col])[col].dropna().to_numpy(dtype='float64')
+        counts, edges = np.histogram(values, bins=bins, range=(stats['min'], stats['max']))
+        edges, counts = edges.tolist(), counts.tolist()
+    labels = [f"{low:.2f} - {high:.2f}" for low, high in zip(edges, edges[1:])]
+    return {'kind': 'histogram', 'labels': labels, 'edges': edges, 'series': {'count': counts}}
+
+
+def _pie(dataset, stats, col, points):
+    counts = distribution(load_dataframe(dataset, columns=[col])[col], col, stats.get('min'), stats.get('max'))
+    counts = counts[counts > 0]
+    labels, values = [str(label) for label in counts.index], [int(count) for count in counts]
+    if len(labels) > points:
+        # Smallest slices past the budget are folded into one
+        labels = labels[:points - 1] + ['Other']
+        values = values[:points - 1] + [sum(values[points - 1:])]
+    return {'kind': 'pie', 'column': col, 'labels': labels, 'series': {'count': values}}
+
+
+def lttb_indices(x, y, threshold):
+    """Positions kept by Largest-Triangle-Three-Buckets downsampling of (x, y) to ``threshold`` points."""
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:threshold])
+
+    # The first and last points are always kept; the rest are split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = [0]
+    anchor = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs((x[anchor] - avg_x) * (y[start:end] - y[anchor]) - (x[anchor] - x[start:end]) * (avg_y - y[anchor]))
+        anchor = start + int(area.argmax())
+        selected.append(anchor)
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+def _lttb(dataset, x, ys, points):
+    df = load_dataframe(dataset, columns=list(dict.fromkeys(([x] if x else []) + ys)))
+    if x:
+        df = df.dropna(subset=[x]).sort_values(x, kind='stable')
+    xs = df[x].to_numpy(dtype='float64') if x else np.arange(len(df), dtype='float64')
+
+    series = {}
+    for col in ys:
+        # Each series keeps its own points, so every one comes with its own x values
+        present = df[col].notna().to_numpy()
+        col_x, col_y = xs[present], df[col].to_numpy(dtype='float64')[present]
+        keep = lttb_indices(col_x, col_y, points)
+        series[col] = {'x': col_x[keep].tolist(), 'y': col_y[keep].tolist()}
+    return {'kind': 'lttb', 'x': x or None, 'series': series}
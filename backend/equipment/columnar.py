@@ -0,0 +1,291 @@
+import os
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .cache import frame_cache, shared_cache
+from .compression import plain_filename, sniff_compression
+from .schema import compact_frame, read_dtypes
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+COLUMNAR_SUFFIX = '.arrow'
+INDEX_SUFFIX = '.idx.arrow'
+
+
+def _arrow_schema(dtypes):
+    fields = []
+    for col, dtype in dtypes.items():
+        if dtype == 'int64':
+            fields.append(pa.field(col, pa.int64()))
+        elif dtype == 'float64':
+            fields.append(pa.field(col, pa.float64()))
+        elif dtype == 'float32':
+            fields.append(pa.field(col, pa.float32()))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+
+def _publish(dataset, write, field='columnar_file', suffix=COLUMNAR_SUFFIX):
+    # Sidecars live next to the CSV (datasets/<name>.arrow) and are written
+    # to a temporary file first so readers never see a half-written copy.
+    root, _ = os.path.splitext(plain_filename(dataset.csv_file.name))
+    name = default_storage.get_available_name(root + suffix)
+    path = default_storage.path(name)
+    tmp_path = path + '.tmp'
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    getattr(dataset, field).name = name
+    dataset.save(update_fields=[field])
+    if field == 'columnar_file':
+        write_sorted_index(dataset)
+
+
+def write_columnar_frame(dataset, df):
+    if pa is None:
+        return
+
+    def write(path):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    _publish(dataset, write)
+
+
+def write_columnar_file(path, dtypes, chunks):
+    # One record batch per chunk, so memory stays bounded by the chunk size
+    # just like the summary pass.
+    schema = _arrow_schema(dtypes)
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, schema) as writer:
+            for chunk in chunks:
+                writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def write_columnar_chunks(dataset, dtypes, chunks):
+    if pa is None:
+        return
+    _publish(dataset, lambda path: write_columnar_file(path, dtypes, chunks))
+
+
+def adopt_columnar_file(dataset, written_path):
+    # For copies written elsewhere (e.g. by a batch worker process)
+    _publish(dataset, lambda path: os.replace(written_path, path))
+
+
+def write_sorted_index(dataset):
+    """Store a stable argsort of every numeric column next to the columnar copy.
+
+    For each column the index holds the row order (``order:<col>``) and the
+    values in that order (``sorted:<col>``), so range predicates resolve to
+    a slice with two binary searches. NaN sorts last.
+    """
+    table = _open_table(dataset.columnar_file.path)
+    arrays, names = [], []
+    for col, column in zip(table.column_names, table.columns):
+        if not (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)):
+            continue
+        values = column.to_numpy()
+        order = np.argsort(values, kind='stable')
+        arrays += [pa.array(order), pa.array(values[order])]
+        names += [f'order:{col}', f'sorted:{col}']
+    index = pa.table(arrays, names=names)
+
+    def write(path):
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_file(sink, index.schema) as writer:
+                writer.write_table(index)
+
+    _publish(dataset, write, field='index_file', suffix=INDEX_SUFFIX)
+
+
+def load_sorted_index(dataset):
+    """{column: (order, sorted_values)} memory-mapped from the index, or {} without one."""
+    if pa is None or not dataset.index_file:
+        return {}
+    try:
+        table = _open_table(dataset.index_file.path)
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return {}
+    index = {}
+    for name in table.column_names:
+        if name.startswith('order:'):
+            col = name[len('order:'):]
+            index[col] = (table.column(name).to_numpy(), table.column(f'sorted:{col}').to_numpy())
+    return index
+
+
+def _open_table(path):
+    return pa.ipc.open_file(pa.memory_map(path)).read_all()
+
+
+def load_rows(dataset, indices, columns=None):
+    """Rows at the given positions, in that order, as a compacted DataFrame."""
+    frame, table = _cached_or_mapped(dataset)
+    if frame is not None:
+        if columns is not None:
+            frame = frame[columns]
+        return frame.iloc[indices].reset_index(drop=True)
+    if table is not None:
+        if columns is not None:
+            table = table.select(columns)
+        return compact_frame(table.take(pa.array(indices, type=pa.int64())).to_pandas())
+    return _read_frame(dataset, columns=columns).iloc[indices].reset_index(drop=True)
+
+
+def load_dataframe(dataset, columns=None, offset=0, limit=None):
+    """Load a dataset's rows, optionally only ``columns`` and rows [offset, offset + limit).
+
+    A dataset's Arrow copy is memory-mapped as it is: every worker on the
+    host reads the same pages, and pages and column subsets are cut from it
+    before conversion, so a page costs the same however large the dataset
+    is. Datasets uploaded before the sidecar existed (or written without
+    pyarrow) have only their CSV; those are parsed once per host into the
+    shared memory-mapped cache, or, with that disabled, once per process
+    into the frame cache (EQUIPMENT_FRAME_CACHE_BYTES).
+    """
+    frame, table = _cached_or_mapped(dataset)
+    if frame is not None:
+        if columns is not None:
+            frame = frame[columns]
+        if offset or limit is not None:
+            frame = frame.iloc[offset:None if limit is None else offset + limit].reset_index(drop=True)
+        return frame
+    if table is not None:
+        return _table_frame(table, columns, offset, limit)
+    return _read_frame(dataset, columns, offset, limit)
+
+
+def _mapped_sidecar(dataset):
+    if pa is None or not dataset.columnar_file:
+        return None
+    try:
+        return _open_table(dataset.columnar_file.path)
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+
+
+def _cache_key(dataset):
+    """The frame caches' key for a CSV-only ``dataset``, or None if it should not be cached."""
+    local, shared = frame_cache.budget > 0, shared_cache.enabled
+    if not (local or shared):
+        return None
+    try:
+        stat = os.stat(dataset.csv_file.path)
+    except FileNotFoundError:
+        return None
+    # Don't parse a whole dataset just to find out it is too big to keep
+    if stat.st_size > max(frame_cache.budget if local else 0, shared_cache.budget if shared else 0):
+        return None
+    return (dataset.pk, dataset.csv_file.name, stat.st_mtime_ns)
+
+
+def _cached_or_mapped(dataset):
+    """(None, table) mapped from the Arrow copy or the shared cache, (frame, None) from this process's cache, or (None, None).
+
+    A CSV-only dataset is parsed whole and cached on a miss: slicing its CSV
+    for every page would cost far more than parsing it once.
+    """
+    table = _mapped_sidecar(dataset)
+    if table is not None:
+        return None, table
+    key = _cache_key(dataset)
+    if key is None:
+        return None, None
+    if shared_cache.enabled:
+        table = shared_cache.get(key)
+        if table is None:
+            table = shared_cache.put(key, _read_frame(dataset))
+        if table is not None:
+            return None, table
+    # Only what no mapping covers is kept per process
+    if frame_cache.budget <= 0:
+        return None, None
+    frame = frame_cache.get(key)
+    if frame is None:
+        frame = _read_frame(dataset)
+        frame_cache.put(key, frame)
+        frame = frame.copy(deep=False)
+    return frame, None
+
+
+def _table_frame(table, columns=None, offset=0, limit=None):
+    if columns is not None:
+        table = table.select(columns)
+    if offset or limit is not None:
+        table = table.slice(offset, limit)
+    return compact_frame(table.to_pandas())
+
+
+def _read_frame(dataset, columns=None, offset=0, limit=None):
+    table = _mapped_sidecar(dataset)
+    if table is not None:
+        return _table_frame(table, columns, offset, limit)
+    path = dataset.csv_file.path
+    df = pd.read_csv(
+        path,
+        dtype=read_dtypes(),
+        compression=sniff_compression(path),
+        usecols=columns,
+        skiprows=range(1, offset + 1) if offset else None,
+        nrows=limit,
+    )
+    if columns is not None:
+        df = df[columns]
+    return compact_frame(df)
+
+
+def iter_frames(dataset, columns=None, offset=0, limit=None, chunk_rows=None):
+    """Yield rows [offset, offset + limit) in DataFrames of at most ``chunk_rows`` rows.
+
+    Unlike load_dataframe this never holds more than one chunk, so it suits
+    exports of any size. Categorical columns come back as plain values so
+    every chunk has the same dtypes.
+    """
+    chunk_rows = chunk_rows or settings.EQUIPMENT_STREAM_CHUNK_ROWS
+    if pa is not None and dataset.columnar_file:
+        try:
+            table = _open_table(dataset.columnar_file.path)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            table = None
+        if table is not None:
+            if columns is not None:
+                table = table.select(columns)
+            for batch in table.slice(offset, limit).to_batches(max_chunksize=chunk_rows):
+                yield _plain_frame(batch.to_pandas())
+            return
+
+    if limit == 0:
+        return
+    path = dataset.csv_file.path
+    reader = pd.read_csv(
+        path,
+        dtype={col: str if dtype == 'category' else dtype for col, dtype in read_dtypes().items()},
+        compression=sniff_compression(path),
+        usecols=columns,
+        skiprows=range(1, offset + 1) if offset else None,
+        nrows=limit,
+        chunksize=chunk_rows,
+    )
+    with reader:
+        for chunk in reader:
+            yield _plain_frame(chunk[columns] if columns is not None else chunk)
+
+
+def _plain_frame(df):
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(df[col].cat.categories.dtype)
+    return df
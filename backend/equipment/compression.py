@@ -0,0 +1,79 @@
+import gzip
+import os
+import zipfile
+
+from django.core.files import File
+
+from .schema import SchemaError
+
+# Magic numbers of the compressed formats field sites send, mapped to the
+# names pandas uses for its compression= argument.
+MAGIC_NUMBERS = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+    (b'PK\x03\x04', 'zip'),
+]
+COMPRESSED_EXTENSIONS = ('.gz', '.gzip', '.zst', '.zstd', '.zip')
+
+# Rough inflation ratio of a compressed CSV, used only to decide whether an
+# upload is large enough to be ingested in streaming mode.
+COMPRESSION_RATIO_ESTIMATE = 10
+
+
+def sniff_compression(file):
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as fh:
+            head = fh.read(4)
+    else:
+        position = file.tell()
+        file.seek(0)
+        head = file.read(4)
+        file.seek(position)
+    for magic, compression in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def estimated_csv_size(file, size):
+    if size is not None and sniff_compression(file):
+        return size * COMPRESSION_RATIO_ESTIMATE
+    return size
+
+
+def plain_filename(filename):
+    root, ext = os.path.splitext(filename)
+    if ext.lower() in COMPRESSED_EXTENSIONS:
+        filename = root
+    if not filename.lower().endswith('.csv'):
+        filename += '.csv'
+    return filename
+
+
+def open_decompressed(file, compression):
+    """Return a read-only stream of the CSV inside a compressed upload.
+
+    Data is inflated as it is read, never all at once.
+    """
+    file.seek(0)
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=file, mode='rb')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise SchemaError("zstd-compressed uploads need the zstandard package on the server.")
+        return zstandard.ZstdDecompressor().stream_reader(file)
+    if compression == 'zip':
+        archive = zipfile.ZipFile(file)
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        if len(members) != 1:
+            raise SchemaError("Zip uploads must contain exactly one CSV file.")
+        return archive.open(members[0])
+    return file
+
+
+def decompressed_file(file, compression, filename):
+    # A Django File over the inflating stream, so storage can write the plain
+    # CSV chunk by chunk.
+    return File(open_decompressed(file, compression), name=plain_filename(filename))
@@ -0,0 +1,71 @@
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def bump_history(user_ids):
+    get_user_model().objects.filter(pk__in=set(user_ids)).update(
+        history_version=F('history_version') + 1,
+        history_modified_at=timezone.now(),
+    )
+
+
+def _representation(request):
+    # The same resource renders differently per query string and negotiated format
+    query = '&'.join(sorted(f"{key}={value}" for key, values in request.GET.lists() for value in values))
+    return f"{request.accepted_media_type}|{query}"
+
+
+def _etag(*parts):
+    return quote_etag(hashlib.sha256('|'.join(str(part) for part in parts).encode()).hexdigest()[:32])
+
+
+def dataset_etag(request, dataset):
+    # Stored rows never change after upload; only the summary may be rebuilt (see ensure_stats)
+    version = (dataset.summary or {}).get('version', 1)
+    return _etag('dataset', dataset.pk, dataset.content_hash or dataset.uploaded_at.isoformat(), version, _representation(request))
+
+
+def report_etag(key):
+    # The key already covers the dataset, chart parameters and template version
+    return quote_etag(key[:32])
+
+
+def history_validators(request):
+    """(ETag, Last-Modified) for the user's history, read fresh from the user row."""
+    version, modified_at = get_user_model().objects.filter(pk=request.user.pk).values_list(
+        'history_version', 'history_modified_at').get()
+    return _etag('history', request.user.pk, version, _representation(request)), modified_at
+
+
+def not_modified(request, etag, last_modified=None):
+    """Return a 304 Response when the request's validators still match, else None.
+
+    If-None-Match takes precedence over If-Modified-Since, as RFC 9110 asks.
+    """
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        # Weak comparison: compressed responses carry the ETag back as W/"..."
+        matched = etag in {tag.removeprefix('W/') for tag in parse_etags(if_none_match)} or if_none_match.strip() == '*'
+    elif last_modified is not None and request.headers.get('If-Modified-Since'):
+        since = parse_http_date_safe(request.headers['If-Modified-Since'])
+        matched = since is not None and int(last_modified.timestamp()) <= since
+    else:
+        matched = False
+    if not matched:
+        return None
+    return with_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+
+def with_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_vary_headers(response, ['Accept'])
+    return response
@@ -0,0 +1,169 @@
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections
+
+from .models import Dataset, IngestJob, ReportVariant, UploadSession
+from .uploads import PARTIAL_UPLOAD_DIR
+
+logger = logging.getLogger(__name__)
+
+# Storage directories whose files are only kept alive by rows pointing at them
+SWEPT_DIRS = ('datasets', 'reports', PARTIAL_UPLOAD_DIR)
+DATASET_FILE_FIELDS = ('csv_file', 'columnar_file', 'index_file', 'pdf_report')
+LAST_RUN_MARKER = '.media-gc'
+
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def referenced_names(names):
+    """The subset of storage ``names`` that some row still points at.
+
+    Deduplicated uploads share their CSV, columnar and index files between
+    Datasets, a queued or running IngestJob owns the upload it will parse
+    and dataset.pdf_report is also one of the cached report variants, so a
+    file is only garbage once none of them refers to it. A finished job's
+    csv_file only records where its upload went and keeps nothing alive.
+    Part files are alive while their UploadSession is open.
+    """
+    names = list(names)
+    referenced = set()
+    for field in DATASET_FILE_FIELDS:
+        referenced.update(Dataset.objects.filter(**{f'{field}__in': names}).values_list(field, flat=True))
+    active_jobs = IngestJob.objects.filter(status__in=[IngestJob.QUEUED, IngestJob.RUNNING])
+    referenced.update(active_jobs.filter(csv_file__in=names).values_list('csv_file', flat=True))
+    referenced.update(ReportVariant.objects.filter(pdf_file__in=names).values_list('pdf_file', flat=True))
+
+    parts = {}
+    for name in names:
+        directory, _, filename = name.rpartition('/')
+        stem, ext = os.path.splitext(filename)
+        if directory == PARTIAL_UPLOAD_DIR and ext == '.part' and stem.isdigit():
+            parts[int(stem)] = name
+    open_sessions = UploadSession.objects.filter(pk__in=list(parts), status=UploadSession.OPEN)
+    referenced.update(parts[pk] for pk in open_sessions.values_list('pk', flat=True))
+    return referenced
+
+
+def release_files(names):
+    """Delete those of ``names`` that no row refers to any more; returns the bytes freed."""
+    names = [name for name in set(names) if name]
+    if not names:
+        return 0
+    return _remove(set(names) - referenced_names(names))
+
+
+def _remove(names):
+    freed = 0
+    for name in names:
+        path = default_storage.path(name)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        freed += size
+    return freed
+
+
+def _walk(directory):
+    # Yields (name, stat) lazily, so a large tree never sits in memory
+    try:
+        entries = os.scandir(default_storage.path(directory))
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            name = f"{directory}/{entry.name}"
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk(name)
+            elif entry.is_file(follow_symlinks=False):
+                try:
+                    yield name, entry.stat()
+                except FileNotFoundError:
+                    continue
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def collect_garbage(dry_run=False, batch_size=None, grace=None):
+    """Remove files under SWEPT_DIRS that no row references.
+
+    The tree is compared against the database EQUIPMENT_MEDIA_GC_BATCH_SIZE
+    names at a time. Files modified within the last EQUIPMENT_MEDIA_GC_GRACE
+    seconds are left alone, since they may belong to an upload that has not
+    committed its row yet. Returns {'scanned', 'files', 'bytes'}; with
+    ``dry_run`` nothing is deleted and the counts are what would have been.
+    """
+    batch_size = batch_size or settings.EQUIPMENT_MEDIA_GC_BATCH_SIZE
+    grace = settings.EQUIPMENT_MEDIA_GC_GRACE if grace is None else grace
+    cutoff = time.time() - grace
+    report = {'scanned': 0, 'files': 0, 'bytes': 0}
+
+    for directory in SWEPT_DIRS:
+        for batch in _batches(_walk(directory), batch_size):
+            report['scanned'] += len(batch)
+            candidates = {name: stat for name, stat in batch if stat.st_mtime < cutoff}
+            if not candidates:
+                continue
+            orphans = set(candidates) - referenced_names(candidates)
+            report['files'] += len(orphans)
+            if dry_run:
+                report['bytes'] += sum(candidates[name].st_size for name in orphans)
+            else:
+                report['bytes'] += _remove(orphans)
+    return report
+
+
+def _run_periodic():
+    global _timer
+    try:
+        # Every worker schedules its own timer; whichever fires first in an interval does the sweep
+        marker = default_storage.path(LAST_RUN_MARKER)
+        try:
+            due = os.path.getmtime(marker) < time.time() - settings.EQUIPMENT_MEDIA_GC_INTERVAL
+        except FileNotFoundError:
+            due = True
+        if due:
+            os.makedirs(os.path.dirname(marker), exist_ok=True)
+            with open(marker, 'a'):
+                os.utime(marker)
+            report = collect_garbage()
+            logger.info(
+                "Media GC scanned %d files, removed %d (%d bytes)", report['scanned'], report['files'], report['bytes'])
+    except Exception:
+        logger.exception("Media GC failed")
+    finally:
+        connections.close_all()
+        with _timer_lock:
+            _timer = None
+        schedule_gc()
+
+
+def schedule_gc():
+    """Start this process's periodic sweep, unless it is running or EQUIPMENT_MEDIA_GC_INTERVAL is 0."""
+    global _timer
+    interval = settings.EQUIPMENT_MEDIA_GC_INTERVAL
+    if interval <= 0:
+        return
+    with _timer_lock:
+        if _timer is not None:
+            return
+        _timer = threading.Timer(interval, _run_periodic)
+        _timer.daemon = True
+        _timer.name = 'media-gc'
+        _timer.start()
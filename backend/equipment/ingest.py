@@ -0,0 +1,378 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .compression import decompressed_file, open_decompressed, sniff_compression
+from .columnar import load_dataframe, write_columnar_chunks, write_columnar_frame
+from .conditional import bump_history
+from .models import Dataset
+from .schema import (
+    NUMERIC_KINDS, MissingColumnsError, SchemaError, check_columns, column_schema, compact_frame, float_dtype,
+    read_dtypes, validate_frame,
+)
+from .stats import LABEL_COLUMN, ColumnStats, GroupStats
+from .upload_handlers import file_sha256
+
+# Bumped whenever summary() gains keys; older summaries are rebuilt on demand
+SUMMARY_VERSION = 2
+
+# What an upload does when its user is at csv_upload_limit (?on_limit=)
+EVICT_OLDEST = 'evict_oldest'
+REJECT = 'reject'
+LIMIT_POLICIES = (EVICT_OLDEST, REJECT)
+
+
+class UploadLimitReached(Exception):
+    def __init__(self, limit, oldest):
+        super().__init__(f"Upload limit of {limit} datasets reached.")
+        self.limit = limit
+        # The datasets on_limit=evict_oldest would have removed
+        self.oldest = oldest
+
+
+class SummaryAccumulator:
+    """Builds the Dataset.summary dict from a sequence of DataFrame chunks.
+
+    Feeding a single frame gives exactly what the old whole-file code produced;
+    feeding chunks keeps only running sums and counts in memory.
+
+    Besides the averages and type counts the summary carries per-column
+    statistics (see stats.ColumnStats), null counts and per-Type aggregates,
+    so that reports and clients never need the rows for them.
+    """
+
+    def __init__(self, schema=None):
+        self.schema = schema or column_schema()
+        self.columns = None
+        self.total_count = 0
+        self.numeric = {}
+        self.int_sums = {}
+        self.float_sums = {}
+        self.counts = {}
+        self.type_counts = {}
+        self.null_counts = {}
+        self.column_stats = {}
+        self.group_stats = GroupStats()
+        self.rng = np.random.default_rng(0)
+
+    def update(self, chunk):
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            check_columns(self.columns)
+            self.numeric = {col: True for col in self.columns}
+            self.int_sums = {col: 0 for col in self.columns}
+            self.float_sums = {col: [] for col in self.columns}
+            self.counts = {col: 0 for col in self.columns}
+            self.null_counts = {col: 0 for col in self.columns}
+            self.column_stats = {col: ColumnStats(self.rng) for col in self.columns}
+
+        validate_frame(chunk, self.schema)
+        self.total_count += len(chunk)
+
+        # A column only counts as numeric if every chunk parsed it as numeric,
+        # which is what select_dtypes would have said about the whole file.
+        numeric_cols = set(chunk.select_dtypes(include=['number']).columns)
+        for col, nulls in chunk.isna().sum().items():
+            self.null_counts[col] += int(nulls)
+        for col in self.columns:
+            if not self.numeric[col]:
+                continue
+            if col not in numeric_cols:
+                self.numeric[col] = False
+                continue
+            values = chunk[col]
+            if values.dtype.kind in 'iu':
+                self.int_sums[col] += int(values.sum())
+            else:
+                self.float_sums[col].append(float(values.sum()))
+            self.counts[col] += int(values.count())
+            self.column_stats[col].update(values, chunk[LABEL_COLUMN])
+        self.group_stats.update(chunk, [col for col in self.columns if self.numeric[col]])
+
+        # Walk the types in order of first appearance; value_counts() on a
+        # Categorical lists them in category order instead.
+        types = chunk['Type']
+        counts = types.value_counts(sort=False)
+        for value in types.dropna().unique():
+            self.type_counts[value] = self.type_counts.get(value, 0) + int(counts[value])
+
+    def summary(self):
+        averages = {}
+        for col in self.columns or []:
+            if not self.numeric[col]:
+                continue
+            if not self.counts[col]:
+                averages[col] = float('nan')
+                continue
+            floats = self.float_sums[col]
+            if not floats:
+                total = float(self.int_sums[col])
+            elif len(floats) == 1 and not self.int_sums[col]:
+                total = floats[0]
+            else:
+                total = math.fsum(floats + [self.int_sums[col]])
+            averages[col] = total / self.counts[col]
+
+        # Same ordering as Series.value_counts(): by count, ties in order of first appearance
+        type_distribution = pd.Series(self.type_counts, dtype='int64').sort_values(ascending=False, kind='stable').to_dict()
+
+        numeric = [col for col in self.columns or [] if self.numeric[col]]
+        int_columns = {col for col in numeric if self.column_stats[col].is_int}
+        return {
+            'total_count': self.total_count,
+            'averages': averages,
+            'type_distribution': type_distribution,
+            'version': SUMMARY_VERSION,
+            'null_counts': dict(self.null_counts),
+            'stats': {col: self.column_stats[col].result() for col in numeric},
+            'by_type': self.group_stats.result(type_distribution, numeric, int_columns),
+        }
+
+    def column_dtypes(self):
+        # The dtypes a whole-file read would have settled on, so that a second
+        # chunked pass can be typed consistently from its first row. Floats
+        # are narrowed here already when EQUIPMENT_FLOAT32 is on.
+        dtypes = {}
+        for col in self.columns or []:
+            if not self.numeric[col]:
+                dtypes[col] = str
+            elif self.float_sums[col]:
+                dtypes[col] = float_dtype() if self.schema.get(col) in NUMERIC_KINDS else 'float64'
+            else:
+                dtypes[col] = 'int64'
+        return dtypes
+
+
+def use_streaming(request, size):
+    if request.query_params.get('mode') == 'stream':
+        return True
+    return size is not None and size > settings.EQUIPMENT_STREAMING_UPLOAD_THRESHOLD
+
+
+def read_csv(file, **kwargs):
+    # Declared dtypes make pandas reject unparseable values itself; report
+    # those (and malformed files) as bad input rather than a server error.
+    # Compressed input is detected from its magic number and inflated by
+    # pandas as it parses.
+    kwargs.setdefault('dtype', read_dtypes())
+    compression = sniff_compression(file)
+    if compression and isinstance(file, (str, os.PathLike)):
+        kwargs['compression'] = compression
+    elif compression:
+        file = open_decompressed(file, compression)
+    try:
+        return pd.read_csv(file, **kwargs)
+    except ImportError as e:
+        raise SchemaError(f"Unsupported compression: {e}")
+    except ValueError as e:
+        raise SchemaError(f"Could not parse CSV: {e}")
+
+
+def read_csv_chunks(file, chunksize=None, dtype=None):
+    # Declared string and category columns are read as text, so chunks agree
+    # on them even when one happens to contain only numeric-looking values.
+    reader = read_csv(file, chunksize=chunksize or settings.EQUIPMENT_CSV_CHUNK_SIZE, dtype=dtype or read_dtypes())
+    with reader:
+        while True:
+            try:
+                chunk = next(reader)
+            except StopIteration:
+                return
+            except ValueError as e:
+                raise SchemaError(f"Could not parse CSV: {e}")
+            yield chunk
+
+
+def scan_csv(file, chunksize=None, progress=None):
+    accumulator = SummaryAccumulator()
+    for chunk in read_csv_chunks(file, chunksize):
+        accumulator.update(chunk)
+        if progress:
+            progress(accumulator.total_count)
+    if accumulator.columns is None:
+        raise MissingColumnsError('Missing required columns.')
+    return accumulator
+
+
+def _calling(callback, chunks):
+    for chunk in chunks:
+        callback()
+        yield chunk
+
+
+def summarize_csv(file, chunksize=None):
+    return scan_csv(file, chunksize).summary()
+
+
+def summarize_dataframe(df):
+    accumulator = SummaryAccumulator()
+    accumulator.update(df)
+    return accumulator.summary()
+
+
+def ensure_stats(dataset):
+    """Return the dataset's summary, rebuilding it once if it predates SUMMARY_VERSION."""
+    summary = dataset.summary or {}
+    if summary.get('version', 1) >= SUMMARY_VERSION or not dataset.csv_file:
+        return summary
+    # The stored keys were computed from the original parse, so they are kept as they are
+    summary = {**summarize_dataframe(load_dataframe(dataset)), **summary, 'version': SUMMARY_VERSION}
+    # Every Dataset sharing the stored file (see find_by_content) gets the upgrade
+    sharing = Dataset.objects.filter(csv_file=dataset.csv_file.name)
+    sharing.update(summary=summary)
+    bump_history(sharing.values_list('user_id', flat=True))
+    dataset.summary = summary
+    return summary
+
+
+def _over_limit(user, incoming, lock):
+    """(limit, excess, oldest): how far ``incoming`` more datasets overshoot the limit, and the oldest to evict."""
+    users = get_user_model().objects
+    limit = (users.select_for_update() if lock else users).values_list('csv_upload_limit', flat=True).get(pk=user.pk)
+    datasets = Dataset.objects.filter(user=user)
+    excess = datasets.count() + incoming - limit
+    if excess <= 0:
+        return limit, excess, []
+    if lock:
+        datasets = datasets.select_for_update()
+    return limit, excess, list(datasets.order_by('uploaded_at', 'id').values('id', 'filename', 'uploaded_at')[:excess])
+
+
+def check_room(user, incoming=1, on_limit=EVICT_OLDEST):
+    # A cheap early refusal before any parsing; make_room has the final say
+    if on_limit == REJECT:
+        limit, _, oldest = _over_limit(user, incoming, lock=False)
+        if oldest:
+            raise UploadLimitReached(limit, oldest)
+
+
+def reserve_room(user, incoming, on_limit=EVICT_OLDEST):
+    """Make room for up to ``incoming`` new datasets at once; returns ``(fitting, refusal)``.
+
+    Only datasets that exist before the call are evicted, so the first
+    ``fitting`` of the incoming ones fit and the rest should be refused with
+    the UploadLimitReached ``refusal`` (None when everything fits). Call it
+    inside the transaction that creates the datasets: the user row stays
+    locked until that commits, so concurrent uploads by one user queue up
+    instead of overshooting the limit or evicting the same dataset twice.
+    """
+    limit, excess, oldest = _over_limit(user, incoming, lock=True)
+    if excess <= 0:
+        return incoming, None
+    if on_limit == REJECT:
+        return max(incoming - excess, 0), UploadLimitReached(limit, oldest)
+    # One DELETE for all of them; post_delete still fires per dataset (see signals.py)
+    Dataset.objects.filter(id__in=[dataset['id'] for dataset in oldest]).delete()
+    if excess <= len(oldest):
+        return incoming, None
+    # Even an empty history has room for no more than the limit
+    return max(incoming - (excess - len(oldest)), 0), UploadLimitReached(limit, [])
+
+
+def make_room(user, incoming=1, on_limit=EVICT_OLDEST):
+    """Evict the user's oldest datasets, or refuse, so ``incoming`` more fit under csv_upload_limit.
+
+    Like reserve_room, call it inside the transaction that creates the datasets.
+    """
+    fitting, refusal = reserve_room(user, incoming, on_limit)
+    if fitting < incoming:
+        raise refusal
+
+
+def find_by_content(content_hash):
+    candidates = Dataset.objects.filter(content_hash=content_hash).exclude(csv_file='').order_by('-uploaded_at')
+    for dataset in candidates:
+        if dataset.csv_file and default_storage.exists(dataset.csv_file.name):
+            return dataset
+    return None
+
+
+def ingest_csv(user, filename, file, stored=None, streaming=False, progress=None, keepalive=None, on_limit=EVICT_OLDEST):
+    """Summarize an uploaded CSV and store it as a Dataset with its columnar copy.
+
+    ``file`` is read for parsing; ``stored`` is what ends up in csv_file and
+    defaults to ``file`` itself. Returns ``(dataset, df)`` where ``df`` is
+    None for streamed ingestion. When streaming, ``progress(rows)`` is called
+    per chunk of the summary pass and ``keepalive()`` per chunk of the
+    columnar pass that follows it.
+
+    Content that has been uploaded before is not parsed or stored again: the
+    new Dataset points at the existing CSV, summary and columnar copy.
+
+    Room under the user's upload limit is made as the Dataset is created
+    (see make_room); with on_limit=REJECT a full history raises
+    UploadLimitReached instead.
+    """
+    content_hash = file_sha256(file)
+    existing = find_by_content(content_hash)
+    if existing is not None:
+        if stored is not None and stored != existing.csv_file.name:
+            default_storage.delete(stored)
+        dataset = clone_dataset(existing, user, filename, on_limit=on_limit)
+        return dataset, None if streaming else load_dataframe(dataset)
+
+    df = None
+    if streaming:
+        # Large uploads are summarized chunk by chunk and never held in memory as a whole
+        accumulator = scan_csv(file, progress=progress)
+        summary = accumulator.summary()
+        file.seek(0)
+    else:
+        df = read_csv(file)
+        summary = summarize_dataframe(df)
+        compact_frame(df)
+
+    dataset = create_dataset(user, filename, file, summary, content_hash, stored=stored, on_limit=on_limit)
+
+    if streaming:
+        dtypes = accumulator.column_dtypes()
+        chunks = read_csv_chunks(dataset.csv_file.path, dtype=dtypes)
+        write_columnar_chunks(dataset, dtypes, _calling(keepalive, chunks) if keepalive else chunks)
+    else:
+        write_columnar_frame(dataset, df)
+
+    return dataset, df
+
+
+def clone_dataset(existing, user, filename, on_limit=EVICT_OLDEST, room_made=False):
+    # room_made: the caller already reserved room in its transaction (see reserve_room)
+    with transaction.atomic():
+        if not room_made:
+            make_room(user, on_limit=on_limit)
+        return Dataset.objects.create(
+            user=user,
+            filename=filename,
+            summary=existing.summary,
+            csv_file=existing.csv_file.name,
+            columnar_file=existing.columnar_file.name or None,
+            index_file=existing.index_file.name or None,
+            content_hash=existing.content_hash,
+        )
+
+
+def create_dataset(user, filename, file, summary, content_hash, stored=None, on_limit=EVICT_OLDEST, room_made=False):
+    csv_file = file if stored is None else stored
+    compression = sniff_compression(file)
+    if compression and not settings.EQUIPMENT_STORE_COMPRESSED:
+        # Storage gets the plain CSV, inflated chunk by chunk while it is written
+        csv_file = decompressed_file(file, compression, filename)
+
+    with transaction.atomic():
+        if not room_made:
+            make_room(user, on_limit=on_limit)
+        dataset = Dataset.objects.create(
+            user=user,
+            filename=filename,
+            summary=summary,
+            csv_file=csv_file,
+            content_hash=content_hash,
+        )
+    if stored is not None and dataset.csv_file.name != stored:
+        default_storage.delete(stored)
+    return dataset
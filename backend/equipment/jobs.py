@@ -0,0 +1,81 @@
+import logging
+import os
+
+from django.db import connections, transaction
+
+from .gc import release_files
+from .ingest import EVICT_OLDEST, SchemaError, UploadLimitReached, ingest_csv
+from .models import IngestJob
+from .workqueue import ClaimLost, LocalWorkers, claim_next, heartbeat
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_ingest(user, filename, csv_file, on_limit=EVICT_OLDEST):
+    job = IngestJob.objects.create(user=user, filename=filename, csv_file=csv_file, on_limit=on_limit)
+    transaction.on_commit(local_workers.kick)
+    return job
+
+
+def claim_next_job():
+    return claim_next(IngestJob)
+
+
+def run_job(job):
+    try:
+        path = job.csv_file.path
+        size = os.path.getsize(path) or 1
+        with open(path, 'rb') as fh:
+            def progress(rows):
+                # Stops the summary pass, before any Dataset exists, once another worker has the job
+                if not heartbeat(job, rows_processed=rows, progress=round(min(fh.tell() / size, 1.0) * 100, 1)):
+                    raise ClaimLost()
+
+            dataset, _ = ingest_csv(
+                job.user, job.filename, fh, stored=job.csv_file.name, streaming=True, progress=progress,
+                keepalive=lambda: heartbeat(job), on_limit=job.on_limit,
+            )
+    except ClaimLost:
+        logger.warning("Ingest job %s was requeued while running; leaving it to its new worker", job.pk)
+        return job
+    except (SchemaError, UploadLimitReached) as e:
+        return _fail(job, str(e))
+    except Exception as e:
+        logger.exception("Ingest job %s failed", job.pk)
+        return _fail(job, f"Ingestion failed: {e}")
+
+    job.status = IngestJob.DONE
+    job.progress = 100
+    job.rows_processed = dataset.summary['total_count']
+    job.dataset = dataset
+    # A duplicate upload is dropped in favour of the stored copy it matched
+    job.csv_file.name = dataset.csv_file.name
+    job.save(update_fields=['status', 'progress', 'rows_processed', 'dataset', 'csv_file', 'updated_at'])
+    return job
+
+
+def _fail(job, error):
+    upload = job.csv_file.name
+    job.status = IngestJob.FAILED
+    job.error = error
+    job.csv_file = None
+    job.save(update_fields=['status', 'error', 'csv_file', 'updated_at'])
+    # Only the job's own upload goes, and only if no Dataset came to share it
+    release_files([upload])
+    return job
+
+
+def drain_queue():
+    try:
+        while True:
+            job = claim_next_job()
+            if job is None:
+                return
+            run_job(job)
+    finally:
+        connections.close_all()
+
+
+# Each web process drains the queue on EQUIPMENT_INGEST_WORKERS threads;
+# with 0 the jobs are left for `manage.py run_ingest_jobs`.
+local_workers = LocalWorkers('EQUIPMENT_INGEST_WORKERS', drain_queue, 'ingest')
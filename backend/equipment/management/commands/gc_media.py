@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from equipment.gc import collect_garbage
+
+
+class Command(BaseCommand):
+    help = "Delete dataset, report and partial upload files that no database row references."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be deleted without deleting it.")
+        parser.add_argument('--batch-size', type=int, help="Files compared against the database per query.")
+        parser.add_argument('--grace', type=int, help="Skip files modified less than this many seconds ago.")
+
+    def handle(self, *args, **options):
+        report = collect_garbage(dry_run=options['dry_run'], batch_size=options['batch_size'], grace=options['grace'])
+        verb = "Would remove" if options['dry_run'] else "Removed"
+        self.stdout.write(
+            f"Scanned {report['scanned']} files. {verb} {report['files']} orphaned files "
+            f"({report['bytes']} bytes)."
+        )
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from equipment.jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Process queued CSV ingestion jobs from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue and exit instead of polling.")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to sleep when the queue is empty.")
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            job = run_job(job)
+            self.stdout.write(f"Job {job.pk} ({job.filename}): {job.status}")
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from equipment.report_jobs import claim_next_report_job, run_report_job
+
+
+class Command(BaseCommand):
+    help = "Render queued PDF report jobs from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue and exit instead of polling.")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to sleep when the queue is empty.")
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_report_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            job = run_report_job(job)
+            self.stdout.write(f"Report job {job.pk} (dataset {job.dataset_id}): {job.status}")
@@ -0,0 +1,130 @@
+import gzip
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Already-compressed payloads gain nothing from another pass
+INCOMPRESSIBLE_TYPES = (
+    'application/pdf', 'application/zip', 'application/gzip', 'application/zstd', 'image/', 'audio/', 'video/',
+)
+
+
+def accepted_encoding(accept_encoding):
+    """'br' or 'gzip', whichever the Accept-Encoding header allows (brotli first), or None."""
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    wildcard = accepted.get('*', 0.0)
+    for name in (('br',) if brotli is not None else ()) + ('gzip',):
+        if accepted.get(name, wildcard) > 0:
+            return name
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding):
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=settings.EQUIPMENT_BROTLI_QUALITY)
+        else:
+            self._brotli = None
+            # wbits=31 writes the gzip header and trailer
+            self._zlib = zlib.compressobj(settings.EQUIPMENT_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        # Flushed per chunk so every streamed chunk reaches the client right away
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def _compressed(compressor, content):
+    for data in content:
+        yield compressor.chunk(data)
+    yield compressor.finish()
+
+
+async def _compressed_async(compressor, content):
+    async for data in content:
+        yield compressor.chunk(data)
+    yield compressor.finish()
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=settings.EQUIPMENT_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=settings.EQUIPMENT_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """Brotli or gzip for API responses, as the client's Accept-Encoding allows.
+
+    Unlike django.middleware.gzip.GZipMiddleware the size threshold and
+    levels are configurable (EQUIPMENT_COMPRESSION_MIN_SIZE,
+    EQUIPMENT_GZIP_LEVEL, EQUIPMENT_BROTLI_QUALITY), brotli is preferred
+    when installed, and already-compressed content such as PDF reports is
+    passed through. Streamed responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self._compressible(response):
+            return response
+        patch_vary_headers(response, ['Accept-Encoding'])
+        encoding = accepted_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            compressor = _Compressor(encoding)
+            if response.is_async:
+                response.streaming_content = _compressed_async(compressor, response.streaming_content)
+            else:
+                response.streaming_content = _compressed(compressor, response.streaming_content)
+            del response['Content-Length']
+        else:
+            body = compress(response.content, encoding)
+            if len(body) >= len(response.content):
+                return response
+            response.content = body
+            response['Content-Length'] = str(len(body))
+
+        # The encoded body is no longer byte-for-byte what a strong ETag promised
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    def _compressible(self, response):
+        if response.has_header('Content-Encoding') or response.status_code in (204, 304):
+            return False
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return False
+        content_type = response.get('Content-Type', '').lower()
+        if content_type.startswith(INCOMPRESSIBLE_TYPES):
+            return False
+        if not response.streaming and len(response.content) < settings.EQUIPMENT_COMPRESSION_MIN_SIZE:
+            return False
+        return True
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0002_dataset_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='columnar_file',
+            field=models.FileField(blank=True, null=True, upload_to='datasets/'),
+        ),
+    ]
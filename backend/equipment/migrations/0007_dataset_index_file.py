@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0006_dataset_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='index_file',
+            field=models.FileField(blank=True, null=True, upload_to='datasets/'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0007_dataset_index_file'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['user', 'uploaded_at', 'id'], name='dataset_user_uploaded_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0008_dataset_dataset_user_uploaded_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestjob',
+            name='on_limit',
+            field=models.CharField(default='evict_oldest', max_length=16),
+        ),
+    ]
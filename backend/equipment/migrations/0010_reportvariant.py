@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0009_ingestjob_on_limit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('pdf_file', models.FileField(upload_to='reports/')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True)),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_variants', to='equipment.dataset')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dataset', 'key'), name='unique_report_variant')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0012_ingestjob_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
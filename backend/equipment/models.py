@@ -9,6 +9,123 @@ class Dataset(models.Model):
     summary = models.JSONField()
     csv_file = models.FileField(upload_to='datasets/', null=True, blank=True)
     pdf_report = models.FileField(upload_to='reports/', null=True, blank=True)
+    columnar_file = models.FileField(upload_to='datasets/', null=True, blank=True)
+    index_file = models.FileField(upload_to='datasets/', null=True, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # History pages, upload-limit eviction and "latest" all filter on user and order by upload time
+            models.Index(fields=['user', 'uploaded_at', 'id'], name='dataset_user_uploaded_idx'),
+        ]
+
+    def __str__(self):
+        return self.filename
+
+class ReportVariant(models.Model):
+    """A rendered PDF report of a dataset for one set of chart parameters (see reports.py)."""
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='report_variants')
+    key = models.CharField(max_length=64)
+    pdf_file = models.FileField(upload_to='reports/')
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dataset', 'key'], name='unique_report_variant'),
+        ]
+
+    def __str__(self):
+        return f"{self.dataset} report {self.key[:8]}"
+
+class IngestJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    csv_file = models.FileField(upload_to='datasets/', null=True, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    # The upload's ?on_limit= policy, applied when the job creates its Dataset
+    on_limit = models.CharField(max_length=16, default='evict_oldest')
+    rows_processed = models.BigIntegerField(default=0)
+    progress = models.FloatField(default=0)
+    dataset = models.ForeignKey(Dataset, on_delete=models.SET_NULL, null=True, blank=True)
+    error = models.TextField(blank=True)
+    # Times a worker has claimed the job (see workqueue.recover_stale)
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Doubles as the running job's heartbeat
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+
+
+class ReportJob(models.Model):
+    """A PDF report rendered in the background (see report_jobs.py)."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    # The parts of reports.build_report, in the order they run
+    STAGE_CHOICES = [
+        ('insights', 'Insights'),
+        ('charts', 'Charts'),
+        ('table', 'Table'),
+        ('build', 'Build'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='report_jobs')
+    # The finished PDF is the dataset's ReportVariant with this key
+    key = models.CharField(max_length=64)
+    bar_x = models.CharField(max_length=255)
+    bar_y = models.TextField()
+    pie_data = models.CharField(max_length=255)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    stage = models.CharField(max_length=16, choices=STAGE_CHOICES, blank=True)
+    error = models.TextField(blank=True)
+    # Times a worker has claimed the job (see workqueue.recover_stale)
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Doubles as the running job's heartbeat
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.dataset} report ({self.status})"
+
+
+class UploadSession(models.Model):
+    OPEN = 'open'
+    COMPLETE = 'complete'
+    STATUS_CHOICES = [
+        (OPEN, 'Open'),
+        (COMPLETE, 'Complete'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField(null=True, blank=True)
+    received_bytes = models.BigIntegerField(default=0)
+    next_chunk = models.IntegerField(default=0)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=OPEN)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return self.filename
\ No newline at end of file
+        return f"{self.filename} ({self.received_bytes} bytes)"
@@ -0,0 +1,122 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+
+
+class PageError(ValueError):
+    pass
+
+
+HISTORY_FIELDS = ('id', 'filename', 'uploaded_at', 'summary')
+
+
+def _encode(prefix, value):
+    return base64.urlsafe_b64encode(f"{prefix}:{value}".encode()).decode().rstrip('=')
+
+
+def _decode(cursor, expected):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        prefix, value = raw.split(':', 1)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise PageError('Invalid cursor.')
+    if prefix != expected:
+        raise PageError('Invalid cursor.')
+    return value
+
+
+def encode_cursor(position):
+    return _encode('row', position)
+
+
+def decode_cursor(cursor):
+    # Rows of a stored dataset never change, so their position is a stable key
+    position = _decode(cursor, 'row')
+    if not position.isdigit():
+        raise PageError('Invalid cursor.')
+    return int(position)
+
+
+def encode_history_cursor(uploaded_at, pk):
+    return _encode('at', f"{uploaded_at.isoformat()}|{pk}")
+
+
+def decode_history_cursor(cursor):
+    # History is keyed on (uploaded_at, id), newest first, so inserts never shift a page
+    try:
+        uploaded_at, pk = _decode(cursor, 'at').rsplit('|', 1)
+        return datetime.fromisoformat(uploaded_at), int(pk)
+    except ValueError:
+        raise PageError('Invalid cursor.')
+
+
+def _non_negative_int(params, name, default):
+    value = params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise PageError(f"'{name}' must be an integer.")
+    if number < 0:
+        raise PageError(f"'{name}' must not be negative.")
+    return number
+
+
+def parse_page(params, columns, unbounded=False):
+    """Read ?fields=, ?offset=/?cursor= and ?limit= into (fields, offset, limit).
+
+    ``fields`` is None when every column was requested. ``limit`` defaults to
+    EQUIPMENT_DETAIL_PAGE_SIZE and is capped at EQUIPMENT_DETAIL_MAX_PAGE_SIZE;
+    with ``unbounded`` (streamed exports) it is None, meaning every remaining
+    row, unless given, and is not capped.
+    """
+    fields = None
+    if params.get('fields'):
+        fields = [field.strip() for field in params['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in columns]
+        if unknown:
+            raise PageError(f"Unknown fields: {', '.join(unknown)}.")
+
+    if params.get('cursor'):
+        offset = decode_cursor(params['cursor'])
+    else:
+        offset = _non_negative_int(params, 'offset', 0)
+
+    if unbounded:
+        return fields, offset, _non_negative_int(params, 'limit', None)
+    limit = _non_negative_int(params, 'limit', settings.EQUIPMENT_DETAIL_PAGE_SIZE)
+    limit = min(limit, settings.EQUIPMENT_DETAIL_MAX_PAGE_SIZE)
+    return fields, offset, limit
+
+
+def page_info(offset, limit, returned, total):
+    end = offset + returned
+    return {
+        'offset': offset,
+        'limit': limit,
+        'total': total,
+        'next_cursor': encode_cursor(end) if returned and end < total else None,
+    }
+
+
+def parse_history_page(params):
+    """Read the history's ?fields=, ?cursor= and ?limit= into (fields, after, limit).
+
+    ``after`` is the (uploaded_at, id) of the last dataset already seen, or
+    None. ``limit`` defaults to EQUIPMENT_HISTORY_PAGE_SIZE and is capped at
+    EQUIPMENT_HISTORY_MAX_PAGE_SIZE.
+    """
+    fields = list(HISTORY_FIELDS)
+    if params.get('fields'):
+        fields = [field.strip() for field in params['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in HISTORY_FIELDS]
+        if unknown:
+            raise PageError(f"Unknown fields: {', '.join(unknown)}.")
+
+    after = decode_history_cursor(params['cursor']) if params.get('cursor') else None
+    limit = _non_negative_int(params, 'limit', settings.EQUIPMENT_HISTORY_PAGE_SIZE)
+    limit = min(limit, settings.EQUIPMENT_HISTORY_MAX_PAGE_SIZE)
+    return fields, after, limit
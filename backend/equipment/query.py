@@ -0,0 +1,128 @@
+import re
+
+import numpy as np
+
+from .columnar import load_rows, load_sorted_index
+
+# One condition per ?filter= parameter: "<column> <op> <value>", e.g.
+#   Pressure > 100    Type in Reciprocating,Centrifugal    Equipment Name ^= Comp
+CONDITION = re.compile(r'^\s*(?P<column>.+?)\s*(?P<op>!=|>=|<=|\^=|=|>|<|\s+in\s+)\s*(?P<value>.*?)\s*$')
+RANGE_OPS = ('=', '>', '>=', '<', '<=')
+
+
+class QueryError(ValueError):
+    pass
+
+
+class Condition:
+    def __init__(self, column, op, value):
+        self.column = column
+        self.op = op
+        self.value = value
+
+    def mask(self, values):
+        if self.op == 'in':
+            return values.isin(self.value).to_numpy()
+        if self.op == '^=':
+            return values.astype(str).str.startswith(self.value).to_numpy() & values.notna().to_numpy()
+        if self.op == '!=':
+            return (values != self.value).to_numpy()
+        return {
+            '=': values.__eq__, '>': values.__gt__, '>=': values.__ge__, '<': values.__lt__, '<=': values.__le__,
+        }[self.op](self.value).to_numpy()
+
+    def bounds(self, sorted_values, valid):
+        """Slice of the sorted index that satisfies this condition; ``valid`` is where NaNs start."""
+        value = self.value
+        if self.op == '=':
+            return np.searchsorted(sorted_values, value, 'left'), np.searchsorted(sorted_values, value, 'right')
+        if self.op == '>':
+            return np.searchsorted(sorted_values, value, 'right'), valid
+        if self.op == '>=':
+            return np.searchsorted(sorted_values, value, 'left'), valid
+        if self.op == '<':
+            return 0, np.searchsorted(sorted_values, value, 'left')
+        return 0, np.searchsorted(sorted_values, value, 'right')
+
+
+def parse_query(params, columns, numeric_columns):
+    """Read ?filter= (repeatable) and ?order_by= into (conditions, ordering)."""
+    conditions = []
+    for text in params.getlist('filter'):
+        match = CONDITION.match(text)
+        if not match:
+            raise QueryError(f"Could not parse filter '{text}'.")
+        column, op, raw = match.group('column'), match.group('op').strip(), match.group('value')
+        if column not in columns:
+            raise QueryError(f"Unknown column '{column}'.")
+        numeric = column in numeric_columns
+        if op == '^=' and numeric:
+            raise QueryError(f"'^=' only applies to text columns, not '{column}'.")
+        if op in ('>', '>=', '<', '<=') and not numeric:
+            raise QueryError(f"'{op}' only applies to numeric columns, not '{column}'.")
+
+        values = [item.strip() for item in raw.split(',')] if op == 'in' else [raw]
+        if numeric:
+            try:
+                values = [float(item) for item in values]
+            except ValueError:
+                raise QueryError(f"Column '{column}' takes numbers, got '{raw}'.")
+        conditions.append(Condition(column, op, values if op == 'in' else values[0]))
+
+    ordering = []
+    for item in params.get('order_by', '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        column = item.lstrip('-')
+        if column not in columns:
+            raise QueryError(f"Unknown column '{column}' in order_by.")
+        ordering.append((column, not item.startswith('-')))
+    return conditions, ordering
+
+
+def run_query(dataset, conditions, ordering, total):
+    """Positions of the rows matching every condition, in the requested order.
+
+    The tightest range condition on an indexed numeric column is answered
+    from the sorted index with binary searches; the remaining conditions
+    are vectorized masks over just those candidate rows.
+    """
+    index = load_sorted_index(dataset)
+    driver = best = None
+    for condition in conditions:
+        if condition.op not in RANGE_OPS or condition.column not in index:
+            continue
+        order, sorted_values = index[condition.column]
+        valid = np.searchsorted(sorted_values, np.nan) if sorted_values.dtype.kind == 'f' else len(sorted_values)
+        low, high = condition.bounds(sorted_values, valid)
+        high = max(low, high)
+        if best is None or high - low < best[2] - best[1]:
+            driver, best = condition, (order, low, high)
+
+    if best is None:
+        candidates = np.arange(total)
+    else:
+        # Back to file order, so unordered results come out as they were uploaded
+        order, low, high = best
+        candidates = np.sort(order[low:high])
+    remaining = [condition for condition in conditions if condition is not driver]
+
+    needed = list(dict.fromkeys([c.column for c in remaining] + [column for column, _ in ordering]))
+    if not needed or not len(candidates):
+        return candidates
+
+    frame = load_rows(dataset, candidates, columns=needed)
+    mask = np.ones(len(frame), dtype=bool)
+    for condition in remaining:
+        mask &= condition.mask(frame[condition.column])
+    matched = candidates[mask]
+
+    if ordering:
+        frame = frame[mask].reset_index(drop=True)
+        by = [column for column, _ in ordering]
+        ascending = [asc for _, asc in ordering]
+        positions = frame.sort_values(by, ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+        matched = matched[positions]
+    return matched
+
@@ -0,0 +1,128 @@
+import json
+
+import pandas as pd
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .columnar import pa
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+ARROW_BATCH_ROWS = 64 * 1024
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """Renders ?format=columnar responses, whose rows are laid out as {column: [values]}.
+
+    With orjson installed NumPy arrays are written straight from their
+    buffers; otherwise this falls back to DRF's own JSON encoding.
+    """
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        return orjson.dumps(
+            data,
+            default=JSONEncoder().default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+
+
+class ArrowStreamRenderer(BaseRenderer):
+    """Renders rows as an Arrow IPC stream that clients can read without decoding.
+
+    The rows are the stream's record batches; every other key of the
+    response (the dataset fields, summary, page or an error) is stored as
+    JSON under the ``response`` key of the schema metadata.
+    """
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        data = dict(data or {})
+        rows = data.pop('equipment_data', None)
+        table = pa.Table.from_pandas(rows if rows is not None else pd.DataFrame(), preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[b'response'] = json.dumps(data, cls=JSONEncoder).encode()
+        table = table.replace_schema_metadata(metadata)
+
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=ARROW_BATCH_ROWS)
+        return sink.getvalue().to_pybytes()
+
+
+class MsgPackRenderer(BaseRenderer):
+    """Renders the response as MessagePack with rows laid out column by column.
+
+    Numeric columns are sent as ``{'dtype': ..., 'data': <raw bytes>}`` so a
+    client can wrap them with numpy.frombuffer; other columns are lists.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=self._default)
+
+    def _default(self, obj):
+        if isinstance(obj, pd.DataFrame):
+            return {col: _column_buffer(obj[col]) for col in obj.columns}
+        return JSONEncoder().default(obj)
+
+# Formats that take the DataFrame itself rather than JSON-ready rows
+BINARY_ROW_RENDERERS = [
+    renderer for renderer, available in ((ArrowStreamRenderer, pa), (MsgPackRenderer, msgpack)) if available is not None
+]
+
+
+def _column_buffer(values):
+    if values.dtype.kind in 'iufb':
+        array = values.to_numpy()
+        return {'dtype': array.dtype.str, 'data': array.tobytes()}
+    return _object_list(values)
+
+
+def _object_list(values):
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+def frame_records(df):
+    # NaN is not valid JSON; missing values become null
+    if not df.isna().to_numpy().any():
+        return df.to_dict(orient='records')
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+
+def frame_data(request, df):
+    """Rows of ``df`` shaped for the renderer the request negotiated."""
+    renderer_format = getattr(getattr(request, 'accepted_renderer', None), 'format', None)
+    if renderer_format in ('arrow', 'msgpack'):
+        return df
+    if renderer_format != 'columnar':
+        return frame_records(df)
+
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if values.dtype.kind in 'iufb':
+            columns[col] = values.to_numpy()
+        else:
+            columns[col] = _object_list(values)
+    return columns
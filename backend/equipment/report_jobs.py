@@ -0,0 +1,76 @@
+import logging
+
+from django.db import connections, transaction
+
+from .models import ReportJob
+from .reports import build_report, cached_report, report_key, store_report
+from .workqueue import LocalWorkers, claim_next, heartbeat
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_report(user, dataset, bar_x, bar_y, pie_data):
+    """A job rendering this report, reusing a pending one for the same parameters.
+
+    When the variant is already stored the job is created finished.
+    """
+    key = report_key(dataset, bar_x, bar_y, pie_data)
+    pending = ReportJob.objects.filter(
+        user=user, dataset=dataset, key=key, status__in=[ReportJob.QUEUED, ReportJob.RUNNING],
+    ).order_by('created_at', 'id').first()
+    if pending is not None:
+        # Its worker may have died; the kick recovers a stale claim (see workqueue.recover_stale)
+        transaction.on_commit(local_workers.kick)
+        return pending
+
+    job = ReportJob(user=user, dataset=dataset, key=key, bar_x=bar_x, bar_y=','.join(bar_y), pie_data=pie_data)
+    if cached_report(dataset, key) is not None:
+        job.status = ReportJob.DONE
+        job.save()
+        return job
+    job.save()
+    transaction.on_commit(local_workers.kick)
+    return job
+
+
+def claim_next_report_job():
+    return claim_next(ReportJob)
+
+
+def run_report_job(job):
+    dataset = job.dataset
+
+    def stage(name):
+        heartbeat(job, stage=name)
+
+    try:
+        # Another job may have rendered the same variant while this one waited
+        if cached_report(dataset, job.key) is None:
+            content = build_report(dataset, job.bar_x, job.bar_y.split(','), job.pie_data, stage=stage)
+            store_report(dataset, job.key, content)
+    except Exception as e:
+        logger.exception("Report job %s failed", job.pk)
+        job.status = ReportJob.FAILED
+        job.error = f"Report generation failed: {e}"
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        return job
+
+    job.status = ReportJob.DONE
+    job.save(update_fields=['status', 'updated_at'])
+    return job
+
+
+def drain_report_queue():
+    try:
+        while True:
+            job = claim_next_report_job()
+            if job is None:
+                return
+            run_report_job(job)
+    finally:
+        connections.close_all()
+
+
+# Each web process renders on EQUIPMENT_REPORT_WORKERS threads; with 0 the
+# jobs are left for `manage.py run_report_jobs`.
+local_workers = LocalWorkers('EQUIPMENT_REPORT_WORKERS', drain_report_queue, 'report')
@@ -0,0 +1,195 @@
+import hashlib
+from datetime import datetime
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from matplotlib.figure import Figure
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .binning import distribution as pie_distribution
+from .columnar import load_dataframe
+from .ingest import ensure_stats
+from .models import Dataset, ReportVariant
+
+# Bump whenever the report's layout or content changes, so cached PDFs are rebuilt
+REPORT_TEMPLATE_VERSION = 1
+
+
+def report_key(dataset, bar_x, bar_y, pie_data):
+    """Cache key of a dataset's report for the given chart parameters."""
+    parts = [
+        REPORT_TEMPLATE_VERSION,
+        dataset.pk,
+        dataset.content_hash or dataset.uploaded_at.isoformat(),
+        (dataset.summary or {}).get('version', 1),
+        bar_x,
+        ','.join(bar_y),
+        pie_data,
+    ]
+    return hashlib.sha256('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def cached_report(dataset, key):
+    """The stored variant for ``key``, marked as just used, or None."""
+    variant = ReportVariant.objects.filter(dataset=dataset, key=key).first()
+    if variant is None:
+        return None
+    if not default_storage.exists(variant.pdf_file.name):
+        variant.delete()
+        return None
+    variant.last_used_at = timezone.now()
+    ReportVariant.objects.filter(pk=variant.pk).update(last_used_at=variant.last_used_at)
+    return variant
+
+
+def store_report(dataset, key, content):
+    """Save a freshly built PDF as the variant for ``key`` and evict the dataset's least recently used ones.
+
+    The newest report also becomes dataset.pdf_report, as before.
+    """
+    name = default_storage.save(f"reports/report_{dataset.pk}_{key[:12]}.pdf", ContentFile(content))
+    try:
+        with transaction.atomic():
+            variant = ReportVariant.objects.create(dataset=dataset, key=key, pdf_file=name)
+    except IntegrityError:
+        # Another request built the same variant first; keep theirs
+        default_storage.delete(name)
+        return ReportVariant.objects.get(dataset=dataset, key=key)
+
+    Dataset.objects.filter(pk=dataset.pk).update(pdf_report=name)
+    stale = dataset.report_variants.order_by('-last_used_at', '-pk')[settings.EQUIPMENT_REPORT_CACHE_VARIANTS:]
+    # Deleting the rows releases their files once nothing refers to them (see signals.py)
+    ReportVariant.objects.filter(pk__in=list(stale.values_list('pk', flat=True))).delete()
+    return variant
+
+
+def build_report(dataset, bar_x, bar_y, pie_data, stage=None):
+    """Render the PDF report and return its bytes.
+
+    ``stage``, if given, is called with 'insights', 'charts', 'table' and
+    'build' as each part of the report is started (see report_jobs.py).
+    """
+    stage = stage or (lambda name: None)
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    styles = getSampleStyleSheet()
+    story = []
+
+    stage('insights')
+    story.append(Paragraph("Chemical Equipment Parameter Report", styles['h1']))
+    story.append(Spacer(1, 0.2 * inch))
+
+    story.append(Paragraph(f"Report generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
+    story.append(Paragraph(f"Dataset ID: {dataset.id}", styles['Normal']))
+    story.append(Paragraph(f"File Name: {dataset.filename}", styles['Normal']))
+    story.append(Spacer(1, 0.2 * inch))
+
+    # Summary Stats
+    summary = ensure_stats(dataset)
+    story.append(Paragraph(f"Total Equipment Count: {summary.get('total_count', 'N/A')}", styles['Normal']))
+    story.append(Paragraph(f"Average Flowrate: <b>{summary.get('averages', {}).get('Flowrate', 'N/A'):.2f}</b>", styles['Normal']))
+    story.append(Paragraph(f"Average Pressure: <b>{summary.get('averages', {}).get('Pressure', 'N/A'):.2f}</b>", styles['Normal']))
+    story.append(Paragraph(f"Average Temperature: <b>{summary.get('averages', {}).get('Temperature', 'N/A'):.2f}</b>", styles['Normal']))
+    story.append(Spacer(1, 0.2 * inch))
+
+    # Data Insights
+    story.append(Paragraph("Data Insights", styles['h3']))
+    story.append(Spacer(1, 0.1 * inch))
+    insights = generate_data_insights(summary)
+    for insight in insights:
+        story.append(Paragraph(insight, styles['Normal']))
+    story.append(Spacer(1, 0.3 * inch))
+
+    stage('charts')
+    df = load_dataframe(dataset)
+
+    # Bar Chart
+    story.append(Paragraph("Equipment Metrics", styles['h2']))
+    bar_chart_img = create_bar_chart(df, bar_x, bar_y)
+    story.append(Image(bar_chart_img, width=6 * inch, height=4 * inch))
+    story.append(Spacer(1, 0.2 * inch))
+
+    # Pie Chart
+    story.append(Paragraph(f"{pie_data} Distribution", styles['h2']))
+    pie_chart_img = create_pie_chart(df, pie_data, summary)
+    story.append(Image(pie_chart_img, width=4 * inch, height=3 * inch))
+    story.append(Spacer(1, 0.2 * inch))
+
+    stage('table')
+    # Data Table
+    story.append(Paragraph("Raw Data", styles['h2']))
+    data = [df.columns.values.tolist()] + df.values.tolist()
+    table = Table(data)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), '#CCCCCC'),
+        ('TEXTCOLOR', (0, 0), (-1, 0), '#000000'),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), '#f7f7f7'),
+        ('GRID', (0, 0), (-1, -1), 1, '#000000')
+    ]))
+    story.append(table)
+
+    stage('build')
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def generate_data_insights(summary):
+    # Everything here comes from the stats precomputed at ingest time
+    insights = []
+    insights.append(f"- This dataset contains data for {summary['total_count']} pieces of equipment.")
+
+    for col, unit in (('Flowrate', ''), ('Pressure', ''), ('Temperature', '°C')):
+        stats = summary['stats'].get(col)
+        if not stats or not stats['count']:
+            continue
+        insights.append(f"- {col} ranges from {stats['min']} to {stats['max']}{unit}. Equipment with highest {col.lower()}: {stats['max_label']}.")
+
+    return insights
+
+
+# Charts draw on their own Figure rather than pyplot's global state, so
+# report workers and request threads can render at the same time.
+def create_bar_chart(df, x_col, y_cols):
+    # One bar per row stops being readable past a few dozen rows; keep the largest
+    if len(df) > settings.EQUIPMENT_REPORT_BAR_POINTS:
+        df = df.nlargest(settings.EQUIPMENT_REPORT_BAR_POINTS, y_cols[0])
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    df.plot(x=x_col, y=y_cols, kind='bar', ax=ax)
+    ax.set_title('Equipment Metrics')
+    ax.set_ylabel('Values')
+    for label in ax.get_xticklabels():
+        label.set_rotation(45)
+        label.set_horizontalalignment('right')
+    fig.tight_layout()
+
+    img_buffer = BytesIO()
+    fig.savefig(img_buffer, format='png')
+    img_buffer.seek(0)
+    return img_buffer
+
+
+def create_pie_chart(df, data_col, summary):
+    stats = summary['stats'].get(data_col) or {}
+    distribution = pie_distribution(df[data_col], data_col, stats.get('min'), stats.get('max'))
+
+    fig = Figure()
+    ax = fig.subplots()
+    ax.pie(distribution, labels=distribution.index, autopct='%1.1f%%', startangle=90)
+    ax.axis('equal')
+    ax.set_title(f'{data_col} Distribution')
+
+    img_buffer = BytesIO()
+    fig.savefig(img_buffer, format='png')
+    img_buffer.seek(0)
+    return img_buffer
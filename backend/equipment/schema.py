@@ -0,0 +1,84 @@
+from django.conf import settings
+
+REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+
+# Column kinds:
+#   string   - free text, kept as Python strings
+#   category - repeated labels, stored as a pandas Categorical
+#   numeric  - must parse as numbers; int/float is left to the data
+#   float    - must parse as numbers, always floating point
+#   int      - must parse as whole numbers without gaps
+DEFAULT_COLUMN_SCHEMA = {
+    'Equipment Name': 'string',
+    'Type': 'category',
+    'Flowrate': 'numeric',
+    'Pressure': 'numeric',
+    'Temperature': 'numeric',
+}
+
+NUMERIC_KINDS = ('numeric', 'float', 'int')
+
+
+class SchemaError(ValueError):
+    pass
+
+
+class MissingColumnsError(SchemaError):
+    pass
+
+
+def column_schema():
+    # EQUIPMENT_COLUMN_SCHEMA can retype the required columns or declare
+    # optional ones; optional columns are only checked when present.
+    schema = dict(DEFAULT_COLUMN_SCHEMA)
+    schema.update(settings.EQUIPMENT_COLUMN_SCHEMA)
+    return schema
+
+
+def float_dtype():
+    return 'float32' if settings.EQUIPMENT_FLOAT32 else 'float64'
+
+
+def read_dtypes(schema=None):
+    """dtype= mapping for pd.read_csv; numeric columns left to inference are omitted."""
+    dtypes = {}
+    for col, kind in (schema or column_schema()).items():
+        if kind == 'string':
+            dtypes[col] = str
+        elif kind == 'category':
+            dtypes[col] = 'category'
+        elif kind == 'float':
+            dtypes[col] = 'float64'
+        elif kind == 'int':
+            dtypes[col] = 'int64'
+    return dtypes
+
+
+def check_columns(columns):
+    if not all(col in columns for col in REQUIRED_COLUMNS):
+        raise MissingColumnsError('Missing required columns.')
+
+
+def validate_frame(df, schema=None):
+    check_columns(df.columns)
+    if not len(df):
+        return
+    for col, kind in (schema or column_schema()).items():
+        if kind in NUMERIC_KINDS and col in df.columns and df[col].dtype.kind not in 'iuf':
+            raise SchemaError(f"Column '{col}' must be numeric.")
+
+
+def compact_frame(df, schema=None):
+    """Apply the declared in-memory dtypes to a frame that has already been summarized.
+
+    Categorical columns become pandas Categoricals and, with
+    EQUIPMENT_FLOAT32 enabled, float columns are narrowed to float32.
+    """
+    for col, kind in (schema or column_schema()).items():
+        if col not in df.columns:
+            continue
+        if kind == 'category' and df[col].dtype.name != 'category':
+            df[col] = df[col].astype('category')
+        elif kind in NUMERIC_KINDS and df[col].dtype.kind == 'f' and df[col].dtype.name != float_dtype():
+            df[col] = df[col].astype(float_dtype())
+    return df
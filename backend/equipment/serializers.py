@@ -1,7 +1,36 @@
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Dataset
+from .models import Dataset, IngestJob, ReportJob, UploadSession
 
 class DatasetSerializer(serializers.ModelSerializer):
     class Meta:
         model = Dataset
-        fields = ['id', 'filename', 'uploaded_at', 'summary']
\ No newline at end of file
+        fields = ['id', 'filename', 'uploaded_at', 'summary']
+
+class IngestJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = IngestJob
+        fields = ['id', 'filename', 'status', 'on_limit', 'rows_processed', 'progress', 'dataset_id', 'error', 'created_at', 'updated_at']
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'dataset_id', 'status', 'stage', 'download_url', 'error', 'created_at', 'updated_at']
+
+    def get_download_url(self, job):
+        if job.status != ReportJob.DONE:
+            return None
+        url = reverse('report_job_download', kwargs={'job_id': job.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    offset = serializers.IntegerField(source='received_bytes', read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'total_size', 'offset', 'next_chunk', 'status', 'created_at', 'updated_at']
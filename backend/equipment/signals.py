@@ -0,0 +1,46 @@
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import frame_cache, shared_cache
+from .conditional import bump_history
+from .gc import DATASET_FILE_FIELDS, release_files, schedule_gc
+from . import jobs, report_jobs
+from .models import Dataset, ReportVariant
+
+
+@receiver(post_save, sender=Dataset)
+def dataset_saved(sender, instance, created, **kwargs):
+    # Saves of an existing row only fill in files, which history doesn't show
+    if created:
+        bump_history([instance.user_id])
+        schedule_gc()
+
+
+@receiver(post_delete, sender=Dataset)
+def dataset_deleted(sender, instance, **kwargs):
+    # Covers DatasetDetailAPIView.delete and upload-limit eviction alike
+    frame_cache.invalidate([instance.pk])
+    shared_cache.invalidate([instance.pk])
+    bump_history([instance.user_id])
+    # Files go once the delete has committed, and only those no other row still shares
+    names = [getattr(instance, field).name for field in DATASET_FILE_FIELDS]
+    transaction.on_commit(lambda: release_files(names))
+    schedule_gc()
+
+
+@receiver(post_delete, sender=ReportVariant)
+def report_variant_deleted(sender, instance, **kwargs):
+    # Evicted variants may still be the dataset's pdf_report
+    name = instance.pdf_file.name
+    transaction.on_commit(lambda: release_files([name]))
+
+
+@receiver(request_started, dispatch_uid='equipment_drain_on_start')
+def drain_on_start(sender, **kwargs):
+    # Jobs queued before this process started (or claimed by a worker that
+    # died) would otherwise wait for the next upload to kick the pool
+    request_started.disconnect(dispatch_uid='equipment_drain_on_start')
+    jobs.local_workers.kick()
+    report_jobs.local_workers.kick()
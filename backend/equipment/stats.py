@@ -0,0 +1,157 @@
+import math
+
+import numpy as np
+from django.conf import settings
+
+QUANTILES = (0.25, 0.5, 0.75)
+LABEL_COLUMN = 'Equipment Name'
+
+
+def _native(value, is_int):
+    return int(value) if is_int else float(value)
+
+
+class ColumnStats:
+    """Mergeable statistics for one numeric column, fed chunk by chunk.
+
+    Count, nulls, min/max, mean and std are exact. Quantiles and the
+    histogram come from the values themselves while they fit in
+    EQUIPMENT_SUMMARY_SAMPLE_SIZE, and from a uniform reservoir sample of
+    that size beyond it (reported as ``sampled``).
+    """
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.is_int = True
+        self.count = 0
+        self.nulls = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.min_label = None
+        self.max_label = None
+        self.seen = 0
+        self.sample = np.empty(0)
+
+    def update(self, values, labels):
+        if values.dtype.kind not in 'iu':
+            self.is_int = False
+        present = values.dropna()
+        self.nulls += len(values) - len(present)
+        if not len(present):
+            return
+
+        # Chan et al. pairwise update of the running mean and squared deviations
+        array = present.to_numpy(dtype='float64')
+        n = len(array)
+        chunk_mean = float(array.mean())
+        chunk_m2 = float(((array - chunk_mean) ** 2).sum())
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.m2 += chunk_m2 + delta * delta * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+
+        # Strict comparisons keep the first row holding the extreme, like idxmin/idxmax
+        low, high = present.idxmin(), present.idxmax()
+        if self.min is None or present[low] < self.min:
+            self.min, self.min_label = present[low], labels[low]
+        if self.max is None or present[high] > self.max:
+            self.max, self.max_label = present[high], labels[high]
+
+        self._add_to_sample(array)
+
+    def _add_to_sample(self, array):
+        capacity = settings.EQUIPMENT_SUMMARY_SAMPLE_SIZE
+        room = max(capacity - len(self.sample), 0)
+        head, tail = array[:room], array[room:]
+        if len(head):
+            self.sample = np.concatenate([self.sample, head])
+        if len(tail):
+            # Algorithm R, vectorized: the i-th value replaces a random slot with probability capacity / (i + 1)
+            positions = np.arange(self.seen + len(head), self.seen + len(array))
+            slots = self.rng.integers(0, positions + 1)
+            keep = slots < capacity
+            self.sample[slots[keep]] = tail[keep]
+        self.seen += len(array)
+
+    def result(self):
+        if not self.count:
+            return {
+                'count': 0, 'nulls': self.nulls, 'min': None, 'max': None, 'mean': None, 'std': None,
+                'min_label': None, 'max_label': None, 'quantiles': {}, 'histogram': {'edges': [], 'counts': []},
+                'sampled': False,
+            }
+
+        sampled = self.seen > len(self.sample)
+        low, high = float(self.min), float(self.max)
+        counts, edges = np.histogram(self.sample, bins=settings.EQUIPMENT_SUMMARY_HISTOGRAM_BINS, range=(low, high))
+        if sampled:
+            counts = np.rint(counts * (self.count / len(self.sample)))
+
+        return {
+            'count': self.count,
+            'nulls': self.nulls,
+            'min': _native(self.min, self.is_int),
+            'max': _native(self.max, self.is_int),
+            'mean': self.mean,
+            # Sample standard deviation (ddof=1), as Series.std() reports it
+            'std': math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else None,
+            'min_label': _label(self.min_label),
+            'max_label': _label(self.max_label),
+            'quantiles': {str(q): float(v) for q, v in zip(QUANTILES, np.quantile(self.sample, QUANTILES))},
+            'histogram': {'edges': edges.tolist(), 'counts': [int(c) for c in counts]},
+            'sampled': sampled,
+        }
+
+
+class GroupStats:
+    """Per-Type count, mean, min and max of each numeric column."""
+
+    def __init__(self):
+        self.groups = {}
+
+    def update(self, chunk, columns):
+        if not columns:
+            return
+        grouped = chunk.groupby('Type', observed=True, sort=False)[columns].agg(['count', 'sum', 'min', 'max'])
+        for group, row in grouped.iterrows():
+            entry = self.groups.setdefault(group, {})
+            for col in columns:
+                count = int(row[(col, 'count')])
+                if not count:
+                    continue
+                low, high = row[(col, 'min')], row[(col, 'max')]
+                current = entry.get(col)
+                if current is None:
+                    entry[col] = [count, row[(col, 'sum')], low, high]
+                else:
+                    current[0] += count
+                    current[1] += row[(col, 'sum')]
+                    current[2] = min(current[2], low)
+                    current[3] = max(current[3], high)
+
+    def result(self, type_distribution, columns, int_columns):
+        by_type = {}
+        for group, size in type_distribution.items():
+            entry = self.groups.get(group, {})
+            aggregates = {}
+            for col in columns:
+                if col not in entry:
+                    continue
+                count, total, low, high = entry[col]
+                is_int = col in int_columns
+                aggregates[col] = {
+                    'mean': float(total) / count,
+                    'min': _native(low, is_int),
+                    'max': _native(high, is_int),
+                }
+            by_type[group] = {'count': size, 'columns': aggregates}
+        return by_type
+
+
+def _label(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return str(value)
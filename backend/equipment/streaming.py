@@ -0,0 +1,94 @@
+import io
+import itertools
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from .columnar import iter_frames, pa
+from .renderers import frame_records, orjson
+
+STREAM_FORMATS = ('json', 'ndjson', 'arrow')
+
+
+class StreamError(ValueError):
+    pass
+
+
+def stream_format(params):
+    """The ?stream= format asked for, or None for a regular paged response."""
+    kind = params.get('stream')
+    if not kind:
+        return None
+    available = [name for name in STREAM_FORMATS if name != 'arrow' or pa is not None]
+    if kind not in available:
+        raise StreamError(f"'stream' must be one of: {', '.join(available)}.")
+    return kind
+
+
+def _dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, default=JSONEncoder().default)
+    return json.dumps(obj, cls=JSONEncoder).encode()
+
+
+def _json_document(head, frames):
+    # The same document a paged response would be, with the rows written as they are read
+    opening = _dumps(head)[:-1]
+    yield opening + (b',' if head else b'') + b'"equipment_data":['
+    first = True
+    for df in frames:
+        if df.empty:
+            continue
+        rows = _dumps(frame_records(df))[1:-1]
+        yield rows if first else b',' + rows
+        first = False
+    yield b']}'
+
+
+def _ndjson_lines(frames):
+    for df in frames:
+        yield b''.join(_dumps(row) + b'\n' for row in frame_records(df))
+
+
+def _arrow_stream(head, frames, from_csv):
+    # The first chunk fixes the schema for the whole stream
+    frames = iter(frames)
+    first = next(frames, None)
+    schema = pa.Schema.from_pandas(first, preserve_index=False) if first is not None else pa.schema([])
+    if from_csv:
+        # Each CSV chunk infers its own dtypes; an integer column may hold NaN or decimals further down
+        schema = pa.schema([
+            field.with_type(pa.float64()) if pa.types.is_integer(field.type) else field for field in schema
+        ], metadata=schema.metadata)
+    schema = schema.with_metadata({**(schema.metadata or {}), b'response': json.dumps(head, cls=JSONEncoder).encode()})
+
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        if first is not None:
+            for df in itertools.chain([first], frames):
+                writer.write_batch(pa.RecordBatch.from_pandas(df, schema=schema, preserve_index=False))
+                yield _drain(sink)
+    yield _drain(sink)
+
+
+def _drain(sink):
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+def stream_rows(dataset, kind, head, columns=None, offset=0, limit=None):
+    """A StreamingHttpResponse writing the rows chunk by chunk, as JSON, NDJSON or an Arrow stream.
+
+    ``head`` holds the rest of the response: the JSON document's other keys,
+    or the Arrow schema's ``response`` metadata. NDJSON carries rows only.
+    """
+    frames = iter_frames(dataset, columns=columns, offset=offset, limit=limit)
+    if kind == 'ndjson':
+        return StreamingHttpResponse(_ndjson_lines(frames), content_type='application/x-ndjson')
+    if kind == 'arrow':
+        rows = _arrow_stream(head, frames, not dataset.columnar_file)
+        return StreamingHttpResponse(rows, content_type='application/vnd.apache.arrow.stream')
+    return StreamingHttpResponse(_json_document(head, frames), content_type='application/json')
@@ -0,0 +1,48 @@
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+HASH_READ_SIZE = 1024 * 1024
+
+
+class HashingUploadMixin:
+    # Hashes each chunk as the handler consumes it, so the SHA-256 of an
+    # upload is known as soon as the request body has been read.
+
+    def new_file(self, *args, **kwargs):
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        remaining = super().receive_data_chunk(raw_data, start)
+        if remaining is None:
+            self.sha256.update(raw_data)
+        return remaining
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def file_sha256(file):
+    digest = getattr(file, 'sha256', None)
+    if digest:
+        return digest
+    # Files that did not come through the hashing handlers (resumable uploads,
+    # queued jobs) are hashed with one sequential read.
+    sha256 = hashlib.sha256()
+    file.seek(0)
+    for piece in iter(lambda: file.read(HASH_READ_SIZE), b''):
+        sha256.update(piece)
+    file.seek(0)
+    return sha256.hexdigest()
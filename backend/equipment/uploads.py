@@ -0,0 +1,64 @@
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .models import UploadSession
+
+PARTIAL_UPLOAD_DIR = 'uploads/partial'
+READ_SIZE = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def part_path(session):
+    return default_storage.path(f"{PARTIAL_UPLOAD_DIR}/{session.pk}.part")
+
+
+def append_chunk(session, stream):
+    """Append the request body to the session's part file at its current offset.
+
+    The body is copied in small reads straight to disk. Anything past the
+    recorded offset (left over from a dropped request) is truncated first,
+    so a retried chunk always lands in the right place.
+    """
+    path = part_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    limit = settings.EQUIPMENT_MAX_UPLOAD_SIZE
+    if session.total_size is not None:
+        limit = min(limit, session.total_size)
+
+    with open(path, 'ab') as fh:
+        fh.truncate(session.received_bytes)
+        written = session.received_bytes
+        for piece in iter(lambda: stream.read(READ_SIZE), b''):
+            written += len(piece)
+            if written > limit:
+                fh.truncate(session.received_bytes)
+                raise UploadTooLarge(f'Upload exceeds its size limit of {limit} bytes.')
+            fh.write(piece)
+
+    session.received_bytes = written
+    session.next_chunk += 1
+    session.save(update_fields=['received_bytes', 'next_chunk', 'updated_at'])
+
+
+def finalize_upload(session):
+    # Move the assembled file into datasets/ so it can be referenced directly
+    # by csv_file without another copy.
+    name = default_storage.get_available_name(f"datasets/{session.filename}")
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(part_path(session), path)
+    session.status = UploadSession.COMPLETE
+    session.save(update_fields=['status', 'updated_at'])
+    return name
+
+
+def discard_upload(session):
+    path = part_path(session)
+    if os.path.exists(path):
+        os.remove(path)
+    session.delete()
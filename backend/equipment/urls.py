@@ -1,5 +1,9 @@
 from django.urls import path
-from .views import UploadCSVAPIView, HistoryAPIView, DownloadPDFReportAPIView, DatasetDetailAPIView
+from .views import (
+    UploadCSVAPIView, BatchUploadAPIView, HistoryAPIView, DownloadPDFReportAPIView, DatasetDetailAPIView, DatasetQueryAPIView,
+    DatasetChartAPIView, IngestJobAPIView, UploadSessionCreateAPIView, UploadSessionAPIView, UploadChunkAPIView,
+    UploadCompleteAPIView, FrameCacheStatsAPIView, ReportJobAPIView, ReportJobDownloadAPIView,
+)
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
@@ -9,9 +13,20 @@ class PingView(APIView):
 
 urlpatterns = [
     path('upload/', UploadCSVAPIView.as_view(), name='upload_csv'),
+    path('upload/batch/', BatchUploadAPIView.as_view(), name='upload_batch'),
+    path('uploads/', UploadSessionCreateAPIView.as_view(), name='upload_session_create'),
+    path('uploads/<int:upload_id>/', UploadSessionAPIView.as_view(), name='upload_session'),
+    path('uploads/<int:upload_id>/chunks/<int:index>/', UploadChunkAPIView.as_view(), name='upload_chunk'),
+    path('uploads/<int:upload_id>/complete/', UploadCompleteAPIView.as_view(), name='upload_complete'),
+    path('jobs/<int:job_id>/', IngestJobAPIView.as_view(), name='ingest_job'),
     path('history/', HistoryAPIView.as_view(), name='history'),
     path('datasets/<int:dataset_id>/', DatasetDetailAPIView.as_view(), name='dataset_detail'),
+    path('datasets/<int:dataset_id>/chart/', DatasetChartAPIView.as_view(), name='dataset_chart'),
+    path('datasets/<int:dataset_id>/query/', DatasetQueryAPIView.as_view(), name='dataset_query'),
+    path('cache/stats/', FrameCacheStatsAPIView.as_view(), name='frame_cache_stats'),
     path('ping/', PingView.as_view(), name='ping'),
     path('download-report/latest/', DownloadPDFReportAPIView.as_view(), {'dataset_id': 'latest'}, name='download_latest_report'),
     path('download-report/<int:dataset_id>/', DownloadPDFReportAPIView.as_view(), name='download_report'),
+    path('report-jobs/<int:job_id>/', ReportJobAPIView.as_view(), name='report_job'),
+    path('report-jobs/<int:job_id>/download/', ReportJobDownloadAPIView.as_view(), name='report_job_download'),
 ]
\ No newline at end of file
@@ -1,112 +1,315 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
-from .models import Dataset
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.settings import api_settings
+from .models import Dataset, IngestJob, ReportJob, UploadSession
 from django.contrib.auth import get_user_model
-from .serializers import DatasetSerializer
+from .serializers import DatasetSerializer, IngestJobSerializer, ReportJobSerializer, UploadSessionSerializer
+from .ingest import (
+    EVICT_OLDEST, LIMIT_POLICIES, SchemaError, UploadLimitReached, check_room, ensure_stats, ingest_csv, use_streaming,
+)
+from .cache import frame_cache, shared_cache
+from .columnar import load_dataframe, load_rows
+from .conditional import dataset_etag, history_validators, not_modified, report_etag, with_validators
+from .compression import estimated_csv_size
+from .batch import ingest_batch
+from .charts import ChartError, chart_series
+from .gc import release_files
+from .jobs import enqueue_ingest, local_workers as ingest_workers
+from .pagination import PageError, encode_history_cursor, page_info, parse_history_page, parse_page
+from .query import QueryError, parse_query, run_query
+from .report_jobs import enqueue_report, local_workers as report_workers
+from .reports import build_report, cached_report, report_key, store_report
+from .renderers import BINARY_ROW_RENDERERS, ColumnarJSONRenderer, frame_data
+from .streaming import StreamError, stream_format, stream_rows
+from .uploads import UploadTooLarge, append_chunk, discard_upload, finalize_upload
 import pandas as pd
-from django.http import HttpResponse
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
-from io import BytesIO
-import matplotlib.pyplot as plt
-import base64
-from datetime import datetime
-from django.core.files.base import ContentFile
+from django.http import FileResponse
+from django.core.files.storage import default_storage
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+import os
+
+# Views that return rows also answer ?format=columnar and, by Accept header
+# or ?format=, Arrow IPC streams and MessagePack
+ROW_RENDERERS = api_settings.DEFAULT_RENDERER_CLASSES + [ColumnarJSONRenderer] + BINARY_ROW_RENDERERS
+
+def limit_policy(request):
+    on_limit = request.query_params.get('on_limit') or request.data.get('on_limit') or EVICT_OLDEST
+    if on_limit not in LIMIT_POLICIES:
+        raise ValueError(f"'on_limit' must be one of: {', '.join(LIMIT_POLICIES)}.")
+    return on_limit
+
+def limit_reached_response(error):
+    return Response(
+        {'error': str(error), 'limit': error.limit, 'would_evict': error.oldest},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+def ingest_response(request, user, filename, file, size, stored=None):
+    try:
+        on_limit = limit_policy(request)
+        check_room(user, on_limit=on_limit)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except UploadLimitReached as e:
+        if stored is not None:
+            default_storage.delete(stored)
+        return limit_reached_response(e)
+
+    if request.query_params.get('mode') == 'async':
+        # Parsing happens on the local ingest workers; poll the job for the dataset id
+        job = enqueue_ingest(user, filename, file if stored is None else stored, on_limit=on_limit)
+        return Response(IngestJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    try:
+        streaming = use_streaming(request, estimated_csv_size(file, size))
+        # Eviction of the oldest datasets happens in the transaction that creates this one
+        dataset, df = ingest_csv(user, filename, file, stored=stored, streaming=streaming, on_limit=on_limit)
+
+        serializer = DatasetSerializer(dataset)
+        response_data = serializer.data
+        response_data['dataset_id'] = dataset.id  # Add this line
+        if not streaming:
+            response_data['equipment_data'] = frame_data(request, df)
+
+        return Response(response_data, status=status.HTTP_201_CREATED)
+    except SchemaError as e:
+        if stored is not None:
+            default_storage.delete(stored)
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except UploadLimitReached as e:
+        if stored is not None:
+            default_storage.delete(stored)
+        return limit_reached_response(e)
+    except Exception as e:
+        if stored is not None:
+            # Unless a Dataset was created from it before the failure
+            release_files([stored])
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class UploadCSVAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = ROW_RENDERERS
 
     def post(self, request, *args, **kwargs):
-        user = request.user
-        # Check if the user has reached their upload limit
-        current_datasets_count = user.dataset_set.count()
-        if current_datasets_count >= user.csv_upload_limit:
-            # If limit is reached, delete the oldest dataset
-            oldest_dataset = user.dataset_set.order_by('uploaded_at').first()
-            if oldest_dataset:
-                oldest_dataset.delete()
-
         file = request.FILES.get('file')
         if not file:
             return Response({'error': 'No file uploaded.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        return ingest_response(request, request.user, file.name, file, file.size)
+
+class BatchUploadAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        files = request.FILES.getlist('files')
+        if not files:
+            return Response({'error': 'No files uploaded.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(files) > settings.EQUIPMENT_BATCH_MAX_FILES:
+            return Response({'error': f'At most {settings.EQUIPMENT_BATCH_MAX_FILES} files per batch.'}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            df = pd.read_csv(file)
-            required_columns = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
-            if not all(col in df.columns for col in required_columns):
-                return Response({'error': 'Missing required columns.'}, status=status.HTTP_400_BAD_REQUEST)
-
-            numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-            summary = {
-                'total_count': len(df),
-                'averages': df[numeric_cols].mean().to_dict(),
-                'type_distribution': df['Type'].value_counts().to_dict(),
-            }
-
-            dataset = Dataset.objects.create(
-                user=user,
-                filename=file.name,
-                summary=summary,
-                csv_file=file
-            )
-
-            # Keep only the last 5 datasets
-            # This logic needs to be updated to consider the user's limit
-            # For now, I will remove it as the limit is handled above
-            # old_datasets = Dataset.objects.order_by('-uploaded_at')[5:]
-            # for old_dataset in old_datasets:
-            #     old_dataset.delete()
+            on_limit = limit_policy(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            serializer = DatasetSerializer(dataset)
-            response_data = serializer.data
-            response_data['dataset_id'] = dataset.id  # Add this line
-            response_data['equipment_data'] = df.to_dict(orient='records')
+        results = ingest_batch(request.user, files, on_limit=on_limit)
+        all_created = all(result['status'] == status.HTTP_201_CREATED for result in results)
+        return Response({'results': results}, status=status.HTTP_201_CREATED if all_created else status.HTTP_207_MULTI_STATUS)
 
-            return Response(response_data, status=status.HTTP_201_CREATED)
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+class UploadSessionCreateAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        filename = request.data.get('filename')
+        if not filename:
+            return Response({'error': 'filename is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        total_size = request.data.get('size')
+        try:
+            total_size = int(total_size) if total_size not in (None, '') else None
+        except (TypeError, ValueError):
+            return Response({'error': 'size must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        session = UploadSession.objects.create(user=request.user, filename=os.path.basename(filename), total_size=total_size)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+class UploadSessionAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, upload_id, *args, **kwargs):
+        try:
+            session = UploadSession.objects.get(id=upload_id, user=request.user)
+        except UploadSession.DoesNotExist:
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(UploadSessionSerializer(session).data)
+
+    def delete(self, request, upload_id, *args, **kwargs):
+        try:
+            session = UploadSession.objects.get(id=upload_id, user=request.user, status=UploadSession.OPEN)
+        except UploadSession.DoesNotExist:
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        discard_upload(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class UploadChunkAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request, upload_id, index, *args, **kwargs):
+        offset = request.headers.get('Upload-Offset', request.query_params.get('offset'))
+        try:
+            offset = int(offset)
+        except (TypeError, ValueError):
+            return Response({'error': 'Upload-Offset header is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if request.stream is None:
+            return Response({'error': 'Empty chunk.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            try:
+                session = UploadSession.objects.select_for_update().get(id=upload_id, user=request.user)
+            except UploadSession.DoesNotExist:
+                return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+            if session.status != UploadSession.OPEN:
+                return Response({'error': 'Upload is already complete.'}, status=status.HTTP_409_CONFLICT)
+
+            if index < session.next_chunk and offset < session.received_bytes:
+                # A retry of a chunk we already have; report where to carry on from
+                return Response(UploadSessionSerializer(session).data)
+            if index != session.next_chunk or offset != session.received_bytes:
+                response_data = UploadSessionSerializer(session).data
+                response_data['error'] = 'Chunk out of order.'
+                return Response(response_data, status=status.HTTP_409_CONFLICT)
+
+            try:
+                append_chunk(session, request.stream)
+            except UploadTooLarge as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(UploadSessionSerializer(session).data)
+
+class UploadCompleteAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = ROW_RENDERERS
+
+    def post(self, request, upload_id, *args, **kwargs):
+        with transaction.atomic():
+            try:
+                session = UploadSession.objects.select_for_update().get(id=upload_id, user=request.user, status=UploadSession.OPEN)
+            except UploadSession.DoesNotExist:
+                return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+            if not session.received_bytes:
+                return Response({'error': 'No data uploaded.'}, status=status.HTTP_400_BAD_REQUEST)
+            if session.total_size is not None and session.received_bytes != session.total_size:
+                response_data = UploadSessionSerializer(session).data
+                response_data['error'] = 'Upload is incomplete.'
+                return Response(response_data, status=status.HTTP_409_CONFLICT)
+            # Refusals that need no parsing come before the session is consumed, so it can be retried
+            try:
+                check_room(request.user, on_limit=limit_policy(request))
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            except UploadLimitReached as e:
+                return limit_reached_response(e)
+            stored = finalize_upload(session)
+
+        with open(default_storage.path(stored), 'rb') as fh:
+            return ingest_response(request, request.user, session.filename, fh, session.received_bytes, stored=stored)
+
+class IngestJobAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id, *args, **kwargs):
+        try:
+            job = IngestJob.objects.get(id=job_id, user=request.user)
+        except IngestJob.DoesNotExist:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        if job.status in (IngestJob.QUEUED, IngestJob.RUNNING):
+            # Polling keeps the queue moving, including recovery of a dead worker's claim
+            ingest_workers.kick()
+        return Response(IngestJobSerializer(job).data)
 
 class HistoryAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        datasets = Dataset.objects.filter(user=request.user).order_by('-uploaded_at')
-        
-        # Manually construct the response data to include the filename
-        response_data = []
-        for dataset in datasets:
-            response_data.append({
-                'id': dataset.id,
-                'filename': dataset.filename,
-                'uploaded_at': dataset.uploaded_at,
-                'summary': dataset.summary
-            })
-            
-        return Response(response_data)
+        # Polling clients get a 304 straight from the version on the user row
+        etag, last_modified = history_validators(request)
+        cached = not_modified(request, etag, last_modified)
+        if cached is not None:
+            return cached
+
+        try:
+            fields, after, limit = parse_history_page(request.query_params)
+        except PageError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Newest first, keyed on (uploaded_at, id) so every page is one range scan of
+        # the (user, uploaded_at, id) index; summary is only read when asked for
+        datasets = Dataset.objects.filter(user=request.user)
+        if after is not None:
+            at, pk = after
+            datasets = datasets.filter(Q(uploaded_at__lt=at) | Q(uploaded_at=at, id__lt=pk))
+        columns = list(dict.fromkeys(fields + ['id', 'uploaded_at']))
+        rows = list(datasets.order_by('-uploaded_at', '-id').values(*columns)[:limit + 1])
+
+        response_data = [{field: row[field] for field in fields} for row in rows[:limit]]
+        response = with_validators(Response(response_data), etag, last_modified)
+        if limit and len(rows) > limit:
+            last = rows[limit - 1]
+            params = request.query_params.copy()
+            params['cursor'] = encode_history_cursor(last['uploaded_at'], last['id'])
+            response['Link'] = f'<{request.build_absolute_uri(request.path)}?{params.urlencode()}>; rel="next"'
+        return response
 
 
 from rest_framework.views import APIView
 
 class DatasetDetailAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = ROW_RENDERERS
 
     def get(self, request, dataset_id, *args, **kwargs):
         try:
             dataset = Dataset.objects.get(id=dataset_id, user=request.user)
             print(f"Dataset found: {dataset.id}")
+            # Datasets are immutable, so a matching ETag needs no rows loaded at all
+            cached = not_modified(request, dataset_etag(request, dataset), dataset.uploaded_at)
+            if cached is not None:
+                return cached
+
+            summary = ensure_stats(dataset)
             serializer = DatasetSerializer(dataset)
             response_data = serializer.data
 
-            # Read the CSV file and include its contents in the response
+            # Only the requested page (and columns) of rows is loaded and returned
+            total = summary.get('total_count', 0)
+            try:
+                stream = stream_format(request.query_params)
+                fields, offset, limit = parse_page(
+                    request.query_params, list(summary.get('null_counts', {})), unbounded=stream is not None)
+            except (PageError, StreamError) as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            if stream is not None and dataset.csv_file:
+                # Exports of every row are written chunk by chunk instead of built in memory
+                remaining = max(total - offset, 0)
+                returned = remaining if limit is None else min(remaining, limit)
+                response_data['page'] = page_info(offset, limit, returned, total)
+                response = stream_rows(dataset, stream, response_data, columns=fields, offset=offset, limit=limit)
+                response = with_validators(response, dataset_etag(request, dataset), dataset.uploaded_at)
+                response['X-Total-Count'] = total
+                return response
+
             if dataset.csv_file:
-                df = pd.read_csv(dataset.csv_file.path)
-                response_data['equipment_data'] = df.to_dict(orient='records')
+                df = load_dataframe(dataset, columns=fields, offset=offset, limit=limit)
+                response_data['equipment_data'] = frame_data(request, df)
+                response_data['page'] = page_info(offset, limit, len(df), total)
 
-            return Response(response_data)
+            response = with_validators(Response(response_data), dataset_etag(request, dataset), dataset.uploaded_at)
+            response['X-Total-Count'] = total
+            return response
         except Dataset.DoesNotExist:
             return Response({"error": "Dataset not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -118,10 +321,113 @@ class DatasetDetailAPIView(APIView):
         except Dataset.DoesNotExist:
             return Response({"error": "Dataset not found"}, status=status.HTTP_404_NOT_FOUND)
 
+class DatasetQueryAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = ROW_RENDERERS
+
+    def get(self, request, dataset_id, *args, **kwargs):
+        try:
+            dataset = Dataset.objects.get(id=dataset_id, user=request.user)
+        except Dataset.DoesNotExist:
+            return Response({"error": "Dataset not found"}, status=status.HTTP_404_NOT_FOUND)
+        if not dataset.csv_file:
+            return Response({"error": "CSV file not found for this dataset"}, status=status.HTTP_404_NOT_FOUND)
+
+        cached = not_modified(request, dataset_etag(request, dataset), dataset.uploaded_at)
+        if cached is not None:
+            return cached
+
+        summary = ensure_stats(dataset)
+        columns = list(summary.get('null_counts', {}))
+        try:
+            fields, offset, limit = parse_page(request.query_params, columns)
+            conditions, ordering = parse_query(request.query_params, columns, summary.get('stats', {}))
+        except (PageError, QueryError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only the matching rows of the requested page are ever materialized
+        positions = run_query(dataset, conditions, ordering, summary.get('total_count', 0))
+        df = load_rows(dataset, positions[offset:offset + limit], columns=fields)
+        response_data = {
+            'dataset_id': dataset.id,
+            'equipment_data': frame_data(request, df),
+            'page': page_info(offset, limit, len(df), len(positions)),
+        }
+        response = with_validators(Response(response_data), dataset_etag(request, dataset), dataset.uploaded_at)
+        response['X-Total-Count'] = len(positions)
+        return response
+
+
+class DatasetChartAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, dataset_id, *args, **kwargs):
+        try:
+            dataset = Dataset.objects.get(id=dataset_id, user=request.user)
+        except Dataset.DoesNotExist:
+            return Response({"error": "Dataset not found"}, status=status.HTTP_404_NOT_FOUND)
+        if not dataset.csv_file:
+            return Response({"error": "CSV file not found for this dataset"}, status=status.HTTP_404_NOT_FOUND)
+
+        cached = not_modified(request, dataset_etag(request, dataset), dataset.uploaded_at)
+        if cached is not None:
+            return cached
+
+        summary = ensure_stats(dataset)
+        try:
+            response_data = chart_series(dataset, summary, request.query_params)
+        except ChartError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        response_data['total'] = summary.get('total_count', 0)
+        return with_validators(Response(response_data), dataset_etag(request, dataset), dataset.uploaded_at)
+
+
+class FrameCacheStatsAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({'process': frame_cache.stats(), 'shared': shared_cache.stats()})
+
+
 class DownloadPDFReportAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, dataset_id=None):
+        dataset, error = self.get_dataset(request, dataset_id)
+        if error is not None:
+            return error
+        bar_x, bar_y, pie_data = self.chart_params(request)
+
+        # A report is rendered once per dataset and chart parameters, then served from storage
+        summary = ensure_stats(dataset)
+        key = report_key(dataset, bar_x, bar_y, pie_data)
+        etag = report_etag(key)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+
+        variant = cached_report(dataset, key)
+        if variant is None:
+            if summary.get('total_count', 0) > settings.EQUIPMENT_REPORT_SYNC_MAX_ROWS:
+                return Response({
+                    "error": "This dataset is too large to render while you wait; POST to this URL to queue the report.",
+                    "max_rows": settings.EQUIPMENT_REPORT_SYNC_MAX_ROWS,
+                }, status=status.HTTP_409_CONFLICT)
+            variant = store_report(dataset, key, build_report(dataset, bar_x, bar_y, pie_data))
+        return report_response(dataset, variant, etag)
+
+    def post(self, request, dataset_id=None):
+        dataset, error = self.get_dataset(request, dataset_id)
+        if error is not None:
+            return error
+        bar_x, bar_y, pie_data = self.chart_params(request)
+
+        ensure_stats(dataset)
+        job = enqueue_report(request.user, dataset, bar_x, bar_y, pie_data)
+        return Response(ReportJobSerializer(job, context={'request': request}).data, status=status.HTTP_202_ACCEPTED)
+
+    def get_dataset(self, request, dataset_id):
+        """(dataset, None), or (None, error response)."""
         try:
             if dataset_id:
                 if dataset_id == 'latest':
@@ -129,158 +435,62 @@ class DownloadPDFReportAPIView(APIView):
                 else:
                     dataset = Dataset.objects.get(id=dataset_id, user=request.user)
             else:
-                return Response({"error": "Dataset ID not provided"}, status=status.HTTP_400_BAD_REQUEST)
+                return None, Response({"error": "Dataset ID not provided"}, status=status.HTTP_400_BAD_REQUEST)
         except Dataset.DoesNotExist:
-            return Response({"error": "Dataset not found"}, status=status.HTTP_404_NOT_FOUND)
+            return None, Response({"error": "Dataset not found"}, status=status.HTTP_404_NOT_FOUND)
 
         if not dataset.csv_file:
-            return Response({"error": "CSV file not found for this dataset"}, status=status.HTTP_404_NOT_FOUND)
-
-        df = pd.read_csv(dataset.csv_file.path)
+            return None, Response({"error": "CSV file not found for this dataset"}, status=status.HTTP_404_NOT_FOUND)
+        return dataset, None
 
-        # Get chart parameters from request, with defaults
+    def chart_params(self, request):
+        # Chart parameters come from the query string, with defaults
         bar_x = request.query_params.get('barX', 'Equipment Name')
         bar_y_str = request.query_params.get('barY', 'Flowrate,Pressure,Temperature')
         bar_y = bar_y_str.split(',')
         pie_data = request.query_params.get('pieData', 'Temperature')
+        return bar_x, bar_y, pie_data
 
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        styles = getSampleStyleSheet()
-        story = []
-
-        story.append(Paragraph("Chemical Equipment Parameter Report", styles['h1']))
-        story.append(Spacer(1, 0.2 * inch))
-
-        story.append(Paragraph(f"Report generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
-        story.append(Paragraph(f"Dataset ID: {dataset.id}", styles['Normal']))
-        story.append(Paragraph(f"File Name: {dataset.filename}", styles['Normal']))
-        story.append(Spacer(1, 0.2 * inch))
-
-        # Summary Stats
-        summary = dataset.summary
-        story.append(Paragraph(f"Total Equipment Count: {summary.get('total_count', 'N/A')}", styles['Normal']))
-        story.append(Paragraph(f"Average Flowrate: <b>{summary.get('averages', {}).get('Flowrate', 'N/A'):.2f}</b>", styles['Normal']))
-        story.append(Paragraph(f"Average Pressure: <b>{summary.get('averages', {}).get('Pressure', 'N/A'):.2f}</b>", styles['Normal']))
-        story.append(Paragraph(f"Average Temperature: <b>{summary.get('averages', {}).get('Temperature', 'N/A'):.2f}</b>", styles['Normal']))
-        story.append(Spacer(1, 0.2 * inch))
-
-        # Data Insights
-        story.append(Paragraph("Data Insights", styles['h3']))
-        story.append(Spacer(1, 0.1 * inch))
-        insights = self.generate_data_insights(df)
-        for insight in insights:
-            story.append(Paragraph(insight, styles['Normal']))
-        story.append(Spacer(1, 0.3 * inch))
-
-        # Bar Chart
-        story.append(Paragraph("Equipment Metrics", styles['h2']))
-        bar_chart_img = self.create_bar_chart(df, bar_x, bar_y)
-        story.append(Image(bar_chart_img, width=6 * inch, height=4 * inch))
-        story.append(Spacer(1, 0.2 * inch))
-
-        # Pie Chart
-        story.append(Paragraph(f"{pie_data} Distribution", styles['h2']))
-        pie_chart_img = self.create_pie_chart(df, pie_data)
-        story.append(Image(pie_chart_img, width=4 * inch, height=3 * inch))
-        story.append(Spacer(1, 0.2 * inch))
-
-        # Data Table
-        story.append(Paragraph("Raw Data", styles['h2']))
-        data = [df.columns.values.tolist()] + df.values.tolist()
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), '#CCCCCC'),
-            ('TEXTCOLOR', (0, 0), (-1, 0), '#000000'),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), '#f7f7f7'),
-            ('GRID', (0, 0), (-1, -1), 1, '#000000')
-        ]))
-        story.append(table)
-
-        doc.build(story)
-
-        pdf_filename = f"report_{dataset.id}.pdf"
-        buffer.seek(0)
-        dataset.pdf_report.save(pdf_filename, ContentFile(buffer.read()), save=True)
-        buffer.seek(0)
-
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{pdf_filename}"'
-        return response
 
-    def generate_data_insights(self, df):
-        insights = []
-        insights.append(f"- This dataset contains data for {len(df)} pieces of equipment.")
-        
-        max_flowrate_eq = df.loc[df['Flowrate'].idxmax()]
-        min_flowrate_eq = df.loc[df['Flowrate'].idxmin()]
-        insights.append(f"- Flowrate ranges from {min_flowrate_eq['Flowrate']} to {max_flowrate_eq['Flowrate']}. Equipment with highest flowrate: {max_flowrate_eq['Equipment Name']}.")
-
-        max_pressure_eq = df.loc[df['Pressure'].idxmax()]
-        min_pressure_eq = df.loc[df['Pressure'].idxmin()]
-        insights.append(f"- Pressure ranges from {min_pressure_eq['Pressure']} to {max_pressure_eq['Pressure']}. Equipment with highest pressure: {max_pressure_eq['Equipment Name']}.")
-
-        max_temp_eq = df.loc[df['Temperature'].idxmax()]
-        min_temp_eq = df.loc[df['Temperature'].idxmin()]
-        insights.append(f"- Temperature ranges from {min_temp_eq['Temperature']} to {max_temp_eq['Temperature']}°C. Equipment with highest temperature: {max_temp_eq['Equipment Name']}.")
-
-        return insights
-
-    def get_category(self, df, col_name, value):
-        if col_name == 'Temperature':
-            if value < 290:
-                return "Cool (<290°C)"
-            elif 290 <= value < 310:
-                return "Warm (290-310°C)"
-            elif 310 <= value < 330:
-                return "Moderately High (310-330°C)"
-            elif 330 <= value < 350:
-                return "High (330-350°C)"
-            else:
-                return "Extremely High (>350°C)"
-        else:
-            # For other numeric columns, create 4 equal-sized bins
-            min_val = df[col_name].min()
-            max_val = df[col_name].max()
-            bin_width = (max_val - min_val) / 4
-            
-            if value < min_val + bin_width:
-                return f"Low ({min_val:.2f} - {min_val + bin_width:.2f})"
-            elif value < min_val + 2 * bin_width:
-                return f"Medium-Low ({min_val + bin_width:.2f} - {min_val + 2 * bin_width:.2f})"
-            elif value < min_val + 3 * bin_width:
-                return f"Medium-High ({min_val + 2 * bin_width:.2f} - {min_val + 3 * bin_width:.2f})"
-            else:
-                return f"High ({min_val + 3 * bin_width:.2f} - {max_val:.2f})"
-
-    def create_bar_chart(self, df, x_col, y_cols):
-        fig, ax = plt.subplots(figsize=(10, 6))
-        df.plot(x=x_col, y=y_cols, kind='bar', ax=ax)
-        plt.title('Equipment Metrics')
-        plt.ylabel('Values')
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-        
-        img_buffer = BytesIO()
-        plt.savefig(img_buffer, format='png')
-        plt.close(fig)
-        img_buffer.seek(0)
-        return img_buffer
-
-    def create_pie_chart(self, df, data_col):
-        df['category'] = df[data_col].apply(lambda x: self.get_category(df, data_col, x))
-        distribution = df['category'].value_counts()
-        
-        fig, ax = plt.subplots()
-        ax.pie(distribution, labels=distribution.index, autopct='%1.1f%%', startangle=90)
-        ax.axis('equal')
-        plt.title(f'{data_col} Distribution')
-
-        img_buffer = BytesIO()
-        plt.savefig(img_buffer, format='png')
-        plt.close(fig)
-        img_buffer.seek(0)
-        return img_buffer
\ No newline at end of file
+def report_response(dataset, variant, etag):
+    response = FileResponse(
+        variant.pdf_file.open('rb'), as_attachment=True, filename=f"report_{dataset.id}.pdf",
+        content_type='application/pdf',
+    )
+    return with_validators(response, etag, variant.created_at)
+
+
+class ReportJobAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id, *args, **kwargs):
+        try:
+            job = ReportJob.objects.get(id=job_id, user=request.user)
+        except ReportJob.DoesNotExist:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        if job.status in (ReportJob.QUEUED, ReportJob.RUNNING):
+            # As with ingest jobs, polling keeps the queue moving
+            report_workers.kick()
+        return Response(ReportJobSerializer(job, context={'request': request}).data)
+
+
+class ReportJobDownloadAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id, *args, **kwargs):
+        try:
+            job = ReportJob.objects.select_related('dataset').get(id=job_id, user=request.user)
+        except ReportJob.DoesNotExist:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        if job.status != ReportJob.DONE:
+            return Response({"error": f"Report is {job.status}, not ready"}, status=status.HTTP_409_CONFLICT)
+
+        etag = report_etag(job.key)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        variant = cached_report(job.dataset, job.key)
+        if variant is None:
+            # Evicted by newer variants of the same dataset (EQUIPMENT_REPORT_CACHE_VARIANTS)
+            return Response({"error": "Report has expired; request it again"}, status=status.HTTP_410_GONE)
+        return report_response(job.dataset, variant, etag)
@@ -0,0 +1,90 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+# Job tables (IngestJob, ReportJob) share status values, `attempts` and an
+# `updated_at` that running jobs keep fresh through heartbeat().
+
+
+def claim_next(model):
+    """Claim the oldest queued ``model`` job as RUNNING, or return None.
+
+    Claiming is a conditional UPDATE, so any number of web workers and
+    management commands can poll the same table safely. Stale claims are
+    recovered first (see recover_stale).
+    """
+    recover_stale(model)
+    while True:
+        job = model.objects.filter(status=model.QUEUED).order_by('created_at', 'id').first()
+        if job is None:
+            return None
+        claimed = model.objects.filter(pk=job.pk, status=model.QUEUED).update(
+            status=model.RUNNING, attempts=F('attempts') + 1, updated_at=timezone.now(),
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+class ClaimLost(Exception):
+    """The job was requeued (see recover_stale) while this worker was still running it."""
+
+
+def heartbeat(job, **fields):
+    """Save ``fields`` on a running job and mark its claim as still alive.
+
+    Returns False, saving nothing, once the claim has been recovered and the
+    job belongs to another worker.
+    """
+    model = type(job)
+    return bool(model.objects.filter(pk=job.pk, status=model.RUNNING, attempts=job.attempts).update(
+        updated_at=timezone.now(), **fields,
+    ))
+
+
+def recover_stale(model):
+    """Requeue RUNNING jobs not heard from in EQUIPMENT_JOB_CLAIM_TIMEOUT seconds.
+
+    Their worker died or was restarted mid-job. A job that has already been
+    claimed EQUIPMENT_JOB_MAX_ATTEMPTS times is failed instead, so one that
+    takes its worker down with it does not do so forever.
+    """
+    now = timezone.now()
+    stale = model.objects.filter(
+        status=model.RUNNING, updated_at__lt=now - timedelta(seconds=settings.EQUIPMENT_JOB_CLAIM_TIMEOUT),
+    )
+    stale.filter(attempts__gte=settings.EQUIPMENT_JOB_MAX_ATTEMPTS).update(
+        status=model.FAILED, error="The worker running this job stopped responding.", updated_at=now,
+    )
+    return stale.update(status=model.QUEUED, updated_at=now)
+
+
+class LocalWorkers:
+    """A thread pool in this process, started on first use, that drains one job table.
+
+    ``setting`` names the pool size; 0 leaves the jobs to a management command.
+    """
+
+    def __init__(self, setting, drain, name):
+        self.setting = setting
+        self.drain = drain
+        self.name = name
+        self._executor = None
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def kick(self):
+        workers = getattr(settings, self.setting)
+        if workers <= 0:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=self.name)
+            # A drain that has not started yet will see whatever is queued now
+            self._pending = [future for future in self._pending if not (future.running() or future.done())]
+            if not self._pending:
+                self._pending.append(self._executor.submit(self.drain))
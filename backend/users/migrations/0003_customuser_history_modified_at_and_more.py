@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_customuser_csv_upload_limit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='history_modified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='history_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -3,6 +3,9 @@ from django.contrib.auth.models import AbstractUser
 
 class CustomUser(AbstractUser):
     csv_upload_limit = models.IntegerField(default=5)
+    # Bumped whenever the user's dataset history changes; used for ETags
+    history_version = models.PositiveIntegerField(default=0)
+    history_modified_at = models.DateTimeField(null=True, blank=True)
     # Add any additional fields you want for your user model here
     # For example:
     # bio = models.TextField(max_length=500, blank=True)
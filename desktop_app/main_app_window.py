@@ -7,6 +7,8 @@ import requests
 from results_page import ResultsPage
 
 BASE_URL = "http://localhost:8000/api/equipment/"
+# The history list only shows names and dates, so the summaries are skipped
+HISTORY_FIELDS = "id,filename,uploaded_at"
 
 class DragDropButton(QPushButton):
     file_dropped = pyqtSignal(str)
@@ -305,7 +307,7 @@ class MainAppWindow(QMainWindow):
         file_path = dropped_file_path
         if not file_path:
             file_dialog = QFileDialog()
-            file_path, _ = file_dialog.getOpenFileName(self, "Upload CSV File", "", "CSV Files (*.csv)")
+            file_path, _ = file_dialog.getOpenFileName(self, "Upload CSV File", "", "CSV Files (*.csv *.csv.gz *.csv.zst *.zip)")
 
         if file_path:
             # Reset font style before displaying new uploaded text
@@ -318,7 +320,8 @@ class MainAppWindow(QMainWindow):
                 with open(file_path, 'rb') as f:
                     files = {'file': (file_path, f, 'text/csv')}
                     headers = {'Authorization': f'Bearer {self.auth_token}'}
-                    response = requests.post(BASE_URL + "upload/", files=files, headers=headers)
+                    # Ask before anything is evicted; the server answers 409 when the limit is reached
+                    response = requests.post(BASE_URL + "upload/", files=files, headers=headers, params={'on_limit': 'reject'})
 
                     if response.status_code == 200 or response.status_code == 201:
                         response_data = response.json()
@@ -331,8 +334,8 @@ class MainAppWindow(QMainWindow):
                         self.results_page = ResultsPage(self.auth_token, self.last_uploaded_file_id, self.login_window, self)
                         self.results_page.show()
                         self.hide()
-                    elif response.status_code == 400 and "upload limit" in response.text:
-                        self.manage_upload_limit(file_path, files, headers)
+                    elif response.status_code == 409:
+                        self.manage_upload_limit(files, headers, response.json())
                     else:
                         QMessageBox.warning(self, "Upload Failed", f"Failed to upload CSV. Status: {response.status_code}, Response: {response.text}")
             except requests.exceptions.ConnectionError:
@@ -347,7 +350,7 @@ class MainAppWindow(QMainWindow):
 
         try:
             headers = {'Authorization': f'Bearer {self.auth_token}'}
-            response = requests.get(BASE_URL + "history/", headers=headers)
+            response = requests.get(BASE_URL + "history/", headers=headers, params={'fields': HISTORY_FIELDS})
 
             self.history_list_widget.clear()
             if response.status_code == 200:
@@ -364,44 +367,28 @@ class MainAppWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Error", f"An error occurred while fetching upload history: {e}")
 
-    def manage_upload_limit(self, new_file_path, new_files, new_headers):
+    def manage_upload_limit(self, new_files, new_headers, limit_response):
         try:
-            headers = {'Authorization': f'Bearer {self.auth_token}'}
-            history_response = requests.get(BASE_URL + "history/", headers=headers)
-            if history_response.status_code == 200:
-                datasets = history_response.json()
-                if len(datasets) >= 5:
-                    oldest_dataset = min(datasets, key=lambda x: x['uploaded_at'])
-                    oldest_dataset_id = oldest_dataset['id']
-                    oldest_dataset_filename = oldest_dataset['filename']
-
-                    reply = QMessageBox.question(self, 'Upload Limit Reached', 
-                                                 f"You have reached your upload limit. The oldest file (Filename: {oldest_dataset_filename}) will be deleted to make space for the new upload. Do you want to proceed?",
-                                                 QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
-
-                    if reply == QMessageBox.Yes:
-                        delete_response = requests.delete(BASE_URL + f"datasets/{oldest_dataset_id}/", headers=headers)
-                        if delete_response.status_code == 204:
-                            # Removed the intermediate QMessageBox.information for deletion
-                            new_files['file'][1].seek(0)
-                            response = requests.post(BASE_URL + "upload/", files=new_files, headers=new_headers)
-                            if response.status_code == 200 or response.status_code == 201:
-                                response_data = response.json()
-                                self.last_uploaded_file_id = response_data.get('id')
-                                self.last_uploaded_file_name = response_data.get('filename')
-                                QMessageBox.information(self, "Upload Success", "File uploaded successfully.") # More concise message
-                                self.drag_drop_area.setText(f"Uploaded: {self.last_uploaded_file_name}")
-                                self.view_upload_history() # Refresh history after successful upload and deletion
-                            else:
-                                QMessageBox.warning(self, "Upload Failed", f"Failed to upload CSV after retry. Status: {response.status_code}, Response: {response.text}")
-                        else:
-                            QMessageBox.warning(self, "Delete Failed", f"Failed to delete oldest file. Status: {delete_response.status_code}, Response: {delete_response.text}")
-                    else:
-                        QMessageBox.information(self, "Upload Cancelled", "Upload cancelled by user.")
+            filenames = ", ".join(dataset['filename'] for dataset in limit_response.get('would_evict', []))
+            reply = QMessageBox.question(self, 'Upload Limit Reached', 
+                                         f"You have reached your upload limit. The oldest file (Filename: {filenames}) will be deleted to make space for the new upload. Do you want to proceed?",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+
+            if reply == QMessageBox.Yes:
+                # The server evicts the oldest datasets and stores the upload in one transaction
+                new_files['file'][1].seek(0)
+                response = requests.post(BASE_URL + "upload/", files=new_files, headers=new_headers, params={'on_limit': 'evict_oldest'})
+                if response.status_code == 200 or response.status_code == 201:
+                    response_data = response.json()
+                    self.last_uploaded_file_id = response_data.get('id')
+                    self.last_uploaded_file_name = response_data.get('filename')
+                    QMessageBox.information(self, "Upload Success", "File uploaded successfully.") # More concise message
+                    self.drag_drop_area.setText(f"Uploaded: {self.last_uploaded_file_name}")
+                    self.view_upload_history() # Refresh history after successful upload and deletion
                 else:
-                    QMessageBox.warning(self, "Upload Failed", "Upload limit not reached, but still failed. This should not happen.")
+                    QMessageBox.warning(self, "Upload Failed", f"Failed to upload CSV after retry. Status: {response.status_code}, Response: {response.text}")
             else:
-                QMessageBox.warning(self, "History Fetch Failed", f"Failed to fetch upload history. Status: {history_response.status_code}, Response: {history_response.text}")
+                QMessageBox.information(self, "Upload Cancelled", "Upload cancelled by user.")
         except requests.exceptions.ConnectionError:
             QMessageBox.critical(self, "Error", "Could not connect to the backend server. Please ensure it is running.")
         except Exception as e:
@@ -427,7 +414,8 @@ class MainAppWindow(QMainWindow):
 
         try:
             headers = {'Authorization': f'Bearer {self.auth_token}'}
-            response = requests.get(BASE_URL + f"datasets/{dataset_id}/", headers=headers)
+            # Only checks the dataset exists; the results page fetches the rows
+            response = requests.get(BASE_URL + f"datasets/{dataset_id}/", headers=headers, params={"limit": 0})
 
             if response.status_code == 200:
                 self.show_results_page(dataset_id)
@@ -1,8 +1,9 @@
 import sys
 import datetime
+import json
 import os
 import tempfile
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QLabel, QPushButton, QComboBox, QCheckBox, QHBoxLayout, QScrollArea, QMessageBox, QFrame, QFileDialog
+from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QLabel, QPushButton, QComboBox, QCheckBox, QHBoxLayout, QScrollArea, QMessageBox, QFrame, QFileDialog, QTableWidget, QTableWidgetItem
 from PyQt5.QtChart import QChart, QChartView, QBarSet, QBarSeries, QPieSeries, QPieSlice, QCategoryAxis, QValueAxis
 from PyQt5.QtGui import QPixmap, QPainter, QCursor
 from PyQt5.QtCore import Qt
@@ -14,6 +15,8 @@ from reportlab.lib.units import inch
 import requests
 from PyQt5.QtWidgets import QToolTip
 BASE_URL = "http://localhost:8000/api/equipment/"
+DETAIL_PAGE_SIZE = 100
+BAR_CHART_POINTS = 200
 
 class ResultsPage(QMainWindow):
     def __init__(self, auth_token, dataset_id, login_window, main_app_window):
@@ -26,6 +29,9 @@ class ResultsPage(QMainWindow):
         self.setGeometry(100, 100, 1400, 880) # Adjusted window size slightly smaller
 
         self.dataset = None
+        self.rows = [] # Only the page of rows on screen
+        self.page = None
+        self.cursors = [None] # Cursors of the pages visited so far; the last one is on screen
         self.available_columns = []
         self.numeric_columns = []
 
@@ -38,8 +44,13 @@ class ResultsPage(QMainWindow):
         self.bar_y_checkboxes = []
         self.pie_data_combo = QComboBox()
         self.insights_label = QLabel("Data Insights will appear here.")
+        self.bar_chart_rows = []
         self.bar_chart_view = QChartView()
         self.pie_chart_view = QChartView()
+        self.rows_table = QTableWidget()
+        self.page_label = QLabel("")
+        self.prev_page_button = QPushButton("Previous")
+        self.next_page_button = QPushButton("Next")
 
         self.init_ui() # Initialize the UI layout
         self.fetch_dataset_details() # Fetch data and then populate UI controls
@@ -177,6 +188,27 @@ class ResultsPage(QMainWindow):
         self.pie_chart_view.setMinimumHeight(400) # Decreased height for pie chart box to make space
         right_column_layout.addWidget(self.pie_chart_view)
 
+        # Raw Data Frame, one page of rows at a time
+        rows_frame = QFrame()
+        rows_frame.setFrameShape(QFrame.StyledPanel)
+        rows_frame.setStyleSheet("background-color: white; border-radius: 10px; padding: 15px; box-shadow: 0px 2px 5px rgba(0, 0, 0, 0.1);")
+        rows_layout = QVBoxLayout(rows_frame)
+        rows_header_layout = QHBoxLayout()
+        rows_header_layout.addWidget(QLabel("Raw Data:"))
+        rows_header_layout.addStretch()
+        rows_header_layout.addWidget(self.page_label)
+        self.prev_page_button.clicked.connect(self.previous_page)
+        self.next_page_button.clicked.connect(self.next_page)
+        self.prev_page_button.setEnabled(False)
+        self.next_page_button.setEnabled(False)
+        rows_header_layout.addWidget(self.prev_page_button)
+        rows_header_layout.addWidget(self.next_page_button)
+        rows_layout.addLayout(rows_header_layout)
+        self.rows_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.rows_table.setMinimumHeight(250)
+        rows_layout.addWidget(self.rows_table)
+        content_layout.addWidget(rows_frame)
+
         main_layout.addLayout(content_layout) # Add content layout to main layout
         self.central_widget.setLayout(main_layout) # Set the main layout for the central widget
 
@@ -186,45 +218,81 @@ class ResultsPage(QMainWindow):
             QMessageBox.warning(self, "Authentication Error", "No authentication token found. Please log in again.")
             return
 
-        headers = {
-            "Authorization": f"Bearer {self.auth_token}"
-        }
         try:
-            response = requests.get(f"http://127.0.0.1:8000/api/equipment/datasets/{self.dataset_id}/", headers=headers)
-            print(f"Response status code: {response.status_code}")
-            print(f"Response text: {response.text}")
-            if response.status_code == 200:
-                self.dataset = response.json()
+            if self.fetch_page(None):
+                self.cursors = [None]
                 print(f"Dataset fetched: {self.dataset}")
 
-                if self.dataset and 'equipment_data' in self.dataset and self.dataset['equipment_data']:
-                    # Extract all unique keys as available columns
-                    all_keys = set()
-                    for item in self.dataset['equipment_data']:
-                        all_keys.update(item.keys())
-                    self.available_columns = list(all_keys)
-
-                    # Determine numeric columns
-                    self.numeric_columns = []
-                    for key in self.available_columns:
-                        # Check if at least one value for this key is numeric
-                        if any(isinstance(item.get(key), (int, float)) for item in self.dataset['equipment_data']):
-                            self.numeric_columns.append(key)
-                    self.selected_bar_y = self.numeric_columns[:] # Select all numeric columns by default
-                else:
-                    self.available_columns = []
-                    self.numeric_columns = []
+                # Columns come from the dataset summary, not from the rows on screen
+                summary = self.dataset.get('summary', {})
+                self.available_columns = list(summary.get('null_counts', {}))
+                column_stats = summary.get('stats', {})
+                self.numeric_columns = [col for col in self.available_columns if col in column_stats]
+                self.selected_bar_y = self.numeric_columns[:] # Select all numeric columns by default
 
                 print(f"Available columns: {self.available_columns}")
                 print(f"Numeric columns: {self.numeric_columns}")
+                self.show_page()
                 self.update_chart_controls() # Populate UI controls after data is fetched
-            else:
-                QMessageBox.warning(self, "Fetch Failed", f"Failed to fetch dataset details. Status: {response.status_code}, Response: {response.text}")
         except requests.exceptions.ConnectionError:
             QMessageBox.critical(self, "Error", "Could not connect to the backend server. Please ensure it is running.")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"An error occurred while fetching dataset details: {e}")
 
+    def fetch_page(self, cursor):
+        # Fetch a single page of rows; the dataset metadata comes along with it
+        headers = {"Authorization": f"Bearer {self.auth_token}"}
+        params = {"limit": DETAIL_PAGE_SIZE}
+        if cursor:
+            params["cursor"] = cursor
+        response = requests.get(BASE_URL + f"datasets/{self.dataset_id}/", headers=headers, params=params)
+        print(f"Response status code: {response.status_code}")
+        if response.status_code != 200:
+            QMessageBox.warning(self, "Fetch Failed", f"Failed to fetch dataset details. Status: {response.status_code}, Response: {response.text}")
+            return False
+        self.dataset = response.json()
+        self.rows = self.dataset.pop('equipment_data', None) or []
+        self.page = self.dataset.pop('page', None) or {}
+        return True
+
+    def go_to_page(self, cursors):
+        try:
+            if self.fetch_page(cursors[-1]):
+                self.cursors = cursors
+                self.show_page()
+        except requests.exceptions.ConnectionError:
+            QMessageBox.critical(self, "Error", "Could not connect to the backend server. Please ensure it is running.")
+
+    def next_page(self):
+        if self.page and self.page.get('next_cursor'):
+            self.go_to_page(self.cursors + [self.page['next_cursor']])
+
+    def previous_page(self):
+        if len(self.cursors) > 1:
+            self.go_to_page(self.cursors[:-1])
+
+    def show_page(self):
+        self.rows_table.clear()
+        self.rows_table.setColumnCount(len(self.available_columns))
+        self.rows_table.setHorizontalHeaderLabels(self.available_columns)
+        self.rows_table.setRowCount(len(self.rows))
+        for row_index, item in enumerate(self.rows):
+            for col_index, col in enumerate(self.available_columns):
+                value = item.get(col)
+                self.rows_table.setItem(row_index, col_index, QTableWidgetItem("" if value is None else str(value)))
+
+        self.page_label.setText(self.page_caption())
+        self.prev_page_button.setEnabled(len(self.cursors) > 1)
+        self.next_page_button.setEnabled(bool(self.page and self.page.get('next_cursor')))
+
+    def page_caption(self):
+        if not self.page:
+            return ""
+        total = self.page.get('total', len(self.rows))
+        first = self.page.get('offset', 0) + 1 if self.rows else 0
+        last = self.page.get('offset', 0) + len(self.rows)
+        return f"Rows {first}-{last} of {total}"
+
     def update_chart_controls(self):
         print("Updating chart controls")
         # Clear existing items and disconnect signals
@@ -267,7 +335,7 @@ class ResultsPage(QMainWindow):
         self.generate_data_insights()
 
     def create_bar_chart(self):
-        if not self.dataset or not self.dataset['equipment_data'] or not self.selected_bar_x or not self.selected_bar_y:
+        if not self.dataset or not self.selected_bar_x or not self.selected_bar_y:
             # Clear the chart if no data or selections
             self.bar_chart_view.setChart(QChart())
             return
@@ -280,8 +348,9 @@ class ResultsPage(QMainWindow):
         series = QBarSeries()
         bar_sets = {col: QBarSet(col) for col in self.selected_bar_y}
 
+        self.bar_chart_rows = self.fetch_bar_chart_rows()
         categories = []
-        for item in self.dataset['equipment_data']:
+        for item in self.bar_chart_rows:
             x_value = str(item.get(self.selected_bar_x, 'N/A'))
             categories.append(x_value)
             for y_col in self.selected_bar_y:
@@ -301,7 +370,7 @@ class ResultsPage(QMainWindow):
         axis_x.setLabelsPosition(QCategoryAxis.AxisLabelsPositionOnValue)
         
         unique_categories = []
-        for item in self.dataset['equipment_data']:
+        for item in self.bar_chart_rows:
             x_value = str(item.get(self.selected_bar_x, 'N/A'))
             if x_value not in unique_categories:
                 unique_categories.append(x_value)
@@ -324,6 +393,30 @@ class ResultsPage(QMainWindow):
         self.bar_chart_view.setChart(chart)
         self.bar_chart_view.setRenderHint(QPainter.Antialiasing)
 
+    def fetch_chart(self, params):
+        # Chart data is computed on the server over the whole dataset
+        headers = {"Authorization": f"Bearer {self.auth_token}"}
+        try:
+            response = requests.get(BASE_URL + f"datasets/{self.dataset_id}/chart/", headers=headers, params=params)
+        except requests.exceptions.ConnectionError:
+            return None
+        if response.status_code != 200:
+            return None
+        return response.json()
+
+    def fetch_bar_chart_rows(self):
+        # Past a few hundred bars the chart is unreadable, so only the top rows are asked for
+        chart = self.fetch_chart({"kind": "top", "x": self.selected_bar_x, "y": ",".join(self.selected_bar_y), "points": BAR_CHART_POINTS})
+        if not chart:
+            return []
+        rows = []
+        for i, label in enumerate(chart['labels']):
+            row = {self.selected_bar_x: label}
+            for col, values in chart['series'].items():
+                row[col] = values[i]
+            rows.append(row)
+        return rows
+
     def show_bar_chart_tooltip(self, is_hovering_signal, index_in_barset, barset_obj):
         if is_hovering_signal:
             value = barset_obj.at(index_in_barset)
@@ -331,8 +424,8 @@ class ResultsPage(QMainWindow):
             x_axis_label = self.bar_x_combo.currentText()
             # Get the actual x-axis category label
             x_category = "N/A"
-            if index_in_barset < len(self.dataset['equipment_data']):
-                x_category = str(self.dataset['equipment_data'][index_in_barset].get(x_axis_label, "N/A"))
+            if index_in_barset < len(self.bar_chart_rows):
+                x_category = str(self.bar_chart_rows[index_in_barset].get(x_axis_label, "N/A"))
 
             numerical_columns = ['Flowrate', 'Pressure', 'Temperature']
             tooltip_text = f"{category}: {value:.2f}"
@@ -345,7 +438,7 @@ class ResultsPage(QMainWindow):
             QToolTip.hideText()
 
     def create_pie_chart(self):
-        if not self.dataset or not self.dataset['equipment_data'] or not self.selected_pie_data:
+        if not self.dataset or not self.selected_pie_data:
             # Clear the chart if no data or selections
             self.pie_chart_view.setChart(QChart())
             return
@@ -379,53 +472,25 @@ class ResultsPage(QMainWindow):
             QToolTip.hideText()
 
     def calculate_dynamic_distribution(self):
-        dynamic_distribution = {}
-        equipment_data = self.dataset['equipment_data']
-        if not equipment_data: return {}
-
-        for item in equipment_data:
-            value = item.get(self.selected_pie_data)
-            if isinstance(value, (int, float)):
-                min_val = min(e.get(self.selected_pie_data, 0) for e in equipment_data if isinstance(e.get(self.selected_pie_data), (int, float)))
-                max_val = max(e.get(self.selected_pie_data, 0) for e in equipment_data if isinstance(e.get(self.selected_pie_data), (int, float)))
-                category = self.get_category(value, min_val, max_val, self.selected_pie_data)
-                dynamic_distribution[category] = dynamic_distribution.get(category, 0) + 1
-            else:
-                dynamic_distribution[value] = dynamic_distribution.get(value, 0) + 1
-        return dynamic_distribution
-
-    def get_category(self, value, min_val, max_val, data_type):
-        if data_type == 'Temperature':
-            if value < 290: return "Cool (<290°C)"
-            if value >= 290 and value < 310: return "Warm (290-310°C)"
-            if value >= 310 and value < 330: return "Moderately High (310-330°C)"
-            if value >= 330 and value < 350: return "High (330-350°C)"
-            return "Extremely High (>350°C)"
-        else:
-            # Generic categorization for other numeric data
-            range_val = max_val - min_val
-            if range_val == 0: return f"{value:.2f}"
-            step = range_val / 4
-            if value < min_val + step: return f"<{min_val + step:.2f}"
-            if value < min_val + 2 * step: return f"{min_val + step:.2f}-{min_val + 2 * step:.2f}"
-            if value < min_val + 3 * step: return f"{min_val + 2 * step:.2f}-{min_val + 3 * step:.2f}"
-            return f">{min_val + 3 * step:.2f}"
+        # Slices are binned on the server, the same way as in the PDF report
+        chart = self.fetch_chart({"kind": "pie", "column": self.selected_pie_data})
+        if not chart:
+            return {}
+        return dict(zip(chart['labels'], chart['series']['count']))
 
     def generate_data_insights(self):
-        if not self.dataset or not self.dataset['equipment_data']:
+        summary = (self.dataset or {}).get('summary', {})
+        if not summary.get('total_count'):
             self.insights_label.setText("No data available for insights.")
             return
 
-        equipment_data = self.dataset['equipment_data']
-        insights = [f"The dataset contains data for {len(equipment_data)} pieces of equipment."]
+        column_stats = summary.get('stats', {})
+        insights = [f"The dataset contains data for {summary['total_count']} pieces of equipment."]
 
         for col in self.numeric_columns:
-            values = [item.get(col) for item in equipment_data if isinstance(item.get(col), (int, float))]
-            if values:
-                min_val = min(values)
-                max_val = max(values)
-                avg_val = sum(values) / len(values)
-                insights.append(f"{col.title()}:<br>  Min={min_val:.2f}<br>  Max={max_val:.2f}<br>  Avg=<b>{avg_val:.2f}</b>") # Made average bold and added newlines
+            stats = column_stats.get(col)
+            if stats and stats['count']:
+                insights.append(f"{col.title()}:<br>  Min={stats['min']:.2f}<br>  Max={stats['max']:.2f}<br>  Avg=<b>{stats['mean']:.2f}</b>") # Made average bold and added newlines
 
         self.insights_label.setText("<br><br>".join(insights))
 
@@ -445,6 +510,16 @@ class ResultsPage(QMainWindow):
         self.close()
         self.main_app_window.show()
 
+    def fetch_all_rows(self):
+        # Streamed as NDJSON, one row per line, rather than walking the pages
+        headers = {"Authorization": f"Bearer {self.auth_token}"}
+        url = BASE_URL + f"datasets/{self.dataset_id}/"
+        with requests.get(url, headers=headers, params={"stream": "ndjson"}, stream=True) as response:
+            if response.status_code != 200:
+                QMessageBox.warning(self, "Fetch Failed", f"Failed to fetch dataset rows. Status: {response.status_code}, Response: {response.text}")
+                return None
+            return [json.loads(line) for line in response.iter_lines() if line]
+
     def generate_pdf_report(self):
         if not self.dataset:
             QMessageBox.warning(self, "No Data", "No dataset loaded to generate a report.")
@@ -454,6 +529,15 @@ class ResultsPage(QMainWindow):
         if not file_name:
             return
 
+        # The report covers every row, not just the page on screen
+        try:
+            all_rows = self.fetch_all_rows()
+        except requests.exceptions.ConnectionError:
+            QMessageBox.critical(self, "Error", "Could not connect to the backend server. Please ensure it is running.")
+            return
+        if all_rows is None:
+            return
+
         doc = SimpleDocTemplate(file_name, pagesize=letter)
         styles = getSampleStyleSheet()
         story = []
@@ -507,10 +591,10 @@ class ResultsPage(QMainWindow):
 
         # Raw Data
         story.append(Paragraph("Raw Data", styles['h2']))
-        if self.dataset and 'equipment_data' in self.dataset and self.dataset['equipment_data']:
-            headers = list(self.dataset['equipment_data'][0].keys())
+        if all_rows:
+            headers = self.available_columns or list(all_rows[0].keys())
             data = [headers]
-            for item in self.dataset['equipment_data']:
+            for item in all_rows:
                 row = [str(item.get(header, "N/A")) for header in headers]
                 data.append(row)
 
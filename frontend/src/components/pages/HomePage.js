@@ -22,6 +22,8 @@ const HomePage = () => {
         headers: {
           Authorization: `Bearer ${token}`,
         },
+        // The list only shows names and dates, so skip the summaries
+        params: { fields: "id,filename,uploaded_at" },
       });
       setHistory(response.data);
     } catch (error) {
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from "react";
-import { useParams, useNavigate, useLocation } from "react-router-dom";
+import { useParams, useNavigate } from "react-router-dom";
 import axios from "axios";
 import { Bar, Pie } from "react-chartjs-2";
 import {
@@ -23,48 +23,53 @@ ChartJS.register(
   ArcElement
 );
 
+const API_URL = "http://127.0.0.1:8000/api/equipment";
+const DETAIL_PAGE_SIZE = 100;
+const BAR_CHART_POINTS = 50;
+
+const authHeaders = () => ({
+  Authorization: `Bearer ${localStorage.getItem('access_token')}`,
+});
+
 const ResultsPage = () => {
   const { id } = useParams();
   const navigate = useNavigate();
-  const location = useLocation();
   const [dataset, setDataset] = useState(null);
+  const [rows, setRows] = useState([]);
+  const [page, setPage] = useState(null);
+  // Cursors of the pages visited so far; the last one is the page on screen
+  const [cursors, setCursors] = useState([null]);
+  const [barChart, setBarChart] = useState(null);
+  const [pieChart, setPieChart] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
   const [selectedBarX, setSelectedBarX] = useState('Equipment Name');
   const [selectedBarY, setSelectedBarY] = useState(['Flowrate', 'Pressure', 'Temperature']);
   const [selectedPieData, setSelectedPieData] = useState('Temperature');
-  const [availableColumns, setAvailableColumns] = useState([]);
 
   const defaultBarX = 'Equipment Name';
   const defaultBarY = ['Flowrate', 'Pressure', 'Temperature'];
   const defaultPieData = 'Temperature';
 
+  // Only the page on screen is fetched; charts come from the chart endpoint
+  const fetchPage = async (cursor) => {
+    const params = { limit: DETAIL_PAGE_SIZE };
+    if (cursor) params.cursor = cursor;
+    const response = await axios.get(`${API_URL}/datasets/${id}/`, { params, headers: authHeaders() });
+    const { equipment_data, page: pageInfo, ...meta } = response.data;
+    setDataset(meta);
+    setRows(equipment_data || []);
+    setPage(pageInfo);
+  };
+
   useEffect(() => {
     const fetchDataset = async () => {
       setLoading(true);
       setError(null);
       try {
-        if (location.state?.dataset) {
-          setDataset(location.state.dataset);
-          if (location.state.dataset.equipment_data && location.state.dataset.equipment_data.length > 0) {
-            setAvailableColumns(Object.keys(location.state.dataset.equipment_data[0]));
-          }
-        } else if (id) {
-          const token = localStorage.getItem('access_token');
-          const response = await axios.get(
-            `http://127.0.0.1:8000/api/equipment/datasets/${id}/`,
-            {
-              headers: {
-                Authorization: `Bearer ${token}`,
-              },
-            }
-          );
-          setDataset(response.data);
-          if (response.data.equipment_data && response.data.equipment_data.length > 0) {
-            setAvailableColumns(Object.keys(response.data.equipment_data[0]));
-          }
-        }
+        await fetchPage(null);
+        setCursors([null]);
       } catch (err) {
         setError("Failed to fetch dataset details.");
       } finally {
@@ -73,25 +78,70 @@ const ResultsPage = () => {
     };
 
     fetchDataset();
-  }, [id, location.state]);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [id]);
+
+  useEffect(() => {
+    if (selectedBarY.length === 0) {
+      setBarChart(null);
+      return;
+    }
+    axios.get(`${API_URL}/datasets/${id}/chart/`, {
+      params: { kind: 'top', x: selectedBarX, y: selectedBarY.join(','), points: BAR_CHART_POINTS },
+      headers: authHeaders(),
+    })
+      .then((response) => setBarChart(response.data))
+      .catch(() => setBarChart(null));
+  }, [id, selectedBarX, selectedBarY]);
+
+  useEffect(() => {
+    axios.get(`${API_URL}/datasets/${id}/chart/`, {
+      params: { kind: 'pie', column: selectedPieData },
+      headers: authHeaders(),
+    })
+      .then((response) => setPieChart(response.data))
+      .catch(() => setPieChart(null));
+  }, [id, selectedPieData]);
+
+  const goToPage = async (nextCursors) => {
+    try {
+      await fetchPage(nextCursors[nextCursors.length - 1]);
+      setCursors(nextCursors);
+    } catch (err) {
+      setError("Failed to fetch dataset rows.");
+    }
+  };
+
+  const handleNextPage = () => goToPage([...cursors, page.next_cursor]);
+  const handlePrevPage = () => goToPage(cursors.slice(0, -1));
 
   const handleDownload = async () => {
     try {
       const token = localStorage.getItem('access_token');
+      const headers = { Authorization: `Bearer ${token}` };
       const params = new URLSearchParams({
         barX: selectedBarX,
         barY: selectedBarY.join(','),
         pieData: selectedPieData,
       }).toString();
-      const response = await axios.get(
-        `http://127.0.0.1:8000/api/equipment/download-report/${id}/?${params}`,
-        {
-          responseType: "blob",
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
+      const reportUrl = `http://127.0.0.1:8000/api/equipment/download-report/${id}/?${params}`;
+      let response;
+      try {
+        response = await axios.get(reportUrl, { responseType: "blob", headers });
+      } catch (err) {
+        if (err.response?.status !== 409) throw err;
+        // Large datasets are rendered in the background; wait for the job
+        let { data: job } = await axios.post(reportUrl, null, { headers });
+        while (job.status === "queued" || job.status === "running") {
+          await new Promise((resolve) => setTimeout(resolve, 1000));
+          ({ data: job } = await axios.get(
+            `http://127.0.0.1:8000/api/equipment/report-jobs/${job.id}/`,
+            { headers }
+          ));
         }
-      );
+        if (job.status !== "done") throw new Error(job.error);
+        response = await axios.get(job.download_url, { responseType: "blob", headers });
+      }
       const url = window.URL.createObjectURL(new Blob([response.data]));
       const link = document.createElement("a");
       link.href = url;
@@ -127,11 +177,10 @@ const ResultsPage = () => {
 
   if (!dataset) return null;
 
-  const equipmentData = dataset.equipment_data || [];
-
-  const numericColumns = availableColumns.filter(col =>
-    equipmentData.length > 0 && typeof equipmentData[0][col] === 'number'
-  );
+  const summary = dataset.summary || {};
+  const columnStats = summary.stats || {};
+  const availableColumns = Object.keys(summary.null_counts || {});
+  const numericColumns = availableColumns.filter(col => col in columnStats);
 
   const handleBarXChange = (e) => {
     setSelectedBarX(e.target.value);
@@ -151,10 +200,10 @@ const ResultsPage = () => {
   };
 
   const barChartData = {
-    labels: equipmentData.map((e) => e[selectedBarX]),
+    labels: barChart ? barChart.labels : [],
     datasets: selectedBarY.map((yCol, index) => ({
       label: yCol,
-      data: equipmentData.map((e) => e[yCol]),
+      data: barChart && barChart.series[yCol] ? barChart.series[yCol] : [],
       backgroundColor: [
         'rgba(255, 99, 132, 0.8)',
         'rgba(54, 162, 235, 0.8)',
@@ -177,42 +226,15 @@ const ResultsPage = () => {
     })),
   };
 
-  const getCategory = (value, min, max, type) => {
-    if (type === 'Temperature') {
-      if (value < 290) return "Cool (<290°C)";
-      if (value >= 290 && value < 310) return "Warm (290-310°C)";
-      if (value >= 310 && value < 330) return "Moderately High (310-330°C)";
-      if (value >= 330 && value < 350) return "High (330-350°C)";
-      return "Extremely High (>350°C)";
-    } else {
-      const range = max - min;
-      const step = range / 4; // 4 categories
-      if (value < min + step) return `Low (<${(min + step).toFixed(2)})`;
-      if (value < min + 2 * step) return `Medium-Low (${(min + step).toFixed(2)}-${(min + 2 * step).toFixed(2)})`;
-      if (value < min + 3 * step) return `Medium-High (${(min + 2 * step).toFixed(2)}-${(min + 3 * step).toFixed(2)})`;
-      return `High (>${(min + 3 * step).toFixed(2)})`;
-    }
-  };
-
-  const dynamicDistribution = equipmentData.reduce((acc, curr) => {
-    const value = curr[selectedPieData];
-    if (typeof value === 'number') {
-      const minVal = Math.min(...equipmentData.map(e => e[selectedPieData]));
-      const maxVal = Math.max(...equipmentData.map(e => e[selectedPieData]));
-      const category = getCategory(value, minVal, maxVal, selectedPieData);
-      acc[category] = (acc[category] || 0) + 1;
-    } else {
-      // Handle non-numeric data for pie chart, e.g., count occurrences
-      acc[value] = (acc[value] || 0) + 1;
-    }
-    return acc;
-  }, {});
+  // Slices are binned on the server, the same way as in the PDF report
+  const pieLabels = pieChart ? pieChart.labels : [];
+  const pieCounts = pieChart ? pieChart.series.count : [];
 
   const pieChartData = {
-    labels: Object.keys(dynamicDistribution),
+    labels: pieLabels,
     datasets: [
       {
-        data: Object.values(dynamicDistribution),
+        data: pieCounts,
         backgroundColor: [
           "rgba(54, 162, 235, 0.8)",
           "rgba(255, 206, 86, 0.8)",
@@ -237,28 +259,26 @@ const ResultsPage = () => {
   };
 
   const generateDataInsights = () => {
-    if (equipmentData.length === 0) return [];
+    if (!summary.total_count) return [];
 
     const insights = [
-      `The dataset contains data for ${equipmentData.length} pieces of equipment.`,
+      `The dataset contains data for ${summary.total_count} pieces of equipment.`,
     ];
 
+    // Ranges and averages come precomputed with the dataset summary
     numericColumns.forEach(col => {
-      const values = equipmentData.map(e => e[col]);
-      if (values.length > 0) {
-        const minVal = Math.min(...values);
-        const maxVal = Math.max(...values);
-        const avgVal = values.reduce((sum, val) => sum + val, 0) / values.length;
+      const stats = columnStats[col];
+      if (stats.count > 0) {
         insights.push(
-          `${col}: Ranges from ${minVal.toFixed(2)} to ${maxVal.toFixed(2)}. Average is <strong>${avgVal.toFixed(2)}</strong>.`
+          `${col}: Ranges from ${stats.min.toFixed(2)} to ${stats.max.toFixed(2)}. Average is <strong>${stats.mean.toFixed(2)}</strong>.`
         );
       }
     });
 
-    if (Object.keys(dynamicDistribution).length > 0) {
+    if (pieLabels.length > 0) {
       insights.push(
-        `Distribution of ${selectedPieData}: ${Object.entries(dynamicDistribution)
-          .map(([k, v]) => `${k}: ${v} items`)
+        `Distribution of ${selectedPieData}: ${pieLabels
+          .map((label, i) => `${label}: ${pieCounts[i]} items`)
           .join(", ")}.`
       );
     }
@@ -396,6 +416,53 @@ const ResultsPage = () => {
             </ul>
           </div>
         </div>
+
+        <div className="bg-white rounded-xl shadow-lg p-6 mt-8">
+          <div className="flex justify-between items-center mb-4">
+            <h3 className="text-xl font-bold text-gray-800">Raw Data</h3>
+            {page && (
+              <div className="flex items-center space-x-4 text-sm text-gray-700">
+                <span>
+                  Rows {page.total === 0 ? 0 : page.offset + 1}–{page.offset + rows.length} of {page.total}
+                </span>
+                <button
+                  onClick={handlePrevPage}
+                  disabled={cursors.length <= 1}
+                  className="bg-gray-200 font-bold py-1 px-3 rounded-lg hover:bg-gray-300 disabled:opacity-50"
+                >
+                  Previous
+                </button>
+                <button
+                  onClick={handleNextPage}
+                  disabled={!page.next_cursor}
+                  className="bg-gray-200 font-bold py-1 px-3 rounded-lg hover:bg-gray-300 disabled:opacity-50"
+                >
+                  Next
+                </button>
+              </div>
+            )}
+          </div>
+          <div className="overflow-x-auto">
+            <table className="min-w-full text-sm text-left text-gray-700">
+              <thead className="bg-gray-100">
+                <tr>
+                  {availableColumns.map(col => (
+                    <th key={col} className="py-2 px-3 font-bold">{col}</th>
+                  ))}
+                </tr>
+              </thead>
+              <tbody>
+                {rows.map((row, index) => (
+                  <tr key={page.offset + index} className="border-t">
+                    {availableColumns.map(col => (
+                      <td key={col} className="py-2 px-3">{row[col] === null ? '' : String(row[col])}</td>
+                    ))}
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+          </div>
+        </div>
       </main>
     </div>
   );